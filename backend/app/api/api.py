@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.api.routes.search_router import router as search_router
+from app.api.routes.search_router import router as search_router, pipeline
+from app.ranking.reranker_processor import reranker_status
+from app.db.opensearch import close_async_client
 from app.utils.logger import logger
-from app.config.settings import DATA_ROOT
+from app.config.settings import DATA_ROOT, RERANKER_PRELOAD
 
 app = FastAPI(
     title="AI Semantic Search API",
@@ -34,6 +36,32 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     logger.info("[API] FastAPI startup event fired")
+    await pipeline.warmup()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_async_client()
+
+# -----------------------------------------------------
+# 🔥 Health Check
+# -----------------------------------------------------
+# Reports whether the reranker model is loaded and
+# warmed up. Used by `make wait_backend`.
+@app.get("/health")
+async def health():
+    reranker = reranker_status()
+    ready = reranker["ready"] or not RERANKER_PRELOAD
+    return {"status": "ok" if ready else "loading", "reranker": reranker}
+
+# -----------------------------------------------------
+# 🔥 Cache Stats
+# -----------------------------------------------------
+# Size and hit / miss counters of the in-process caches
+# (per worker).
+@app.get("/stats/cache")
+async def cache_stats():
+    return pipeline.cache_stats()
 
 # -----------------------------------------------------
 # 🔥 API Routers
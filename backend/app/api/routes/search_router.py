@@ -1,6 +1,7 @@
 from typing import Optional
 from fastapi import APIRouter, UploadFile, File, Form
 from app.pipeline.search_pipeline import SearchPipeline
+from app.processors.filters import SearchFilters
 
 router = APIRouter()
 pipeline = SearchPipeline()
@@ -18,6 +19,11 @@ async def search(
     reranker_score: float = Form(0.0),
 
     store: Optional[str] = Form(None),  # <<< EKLENDİ
+    brand: Optional[str] = Form(None),
+    product_group: Optional[str] = Form(None),
+    price_min: Optional[float] = Form(None),
+    price_max: Optional[float] = Form(None),
+    fusion: Optional[str] = Form(None),
 ):
     """
     Semantic Search API
@@ -39,10 +45,23 @@ async def search(
         Minimum threshold output of reranker
     store : str
         Store filtering ("jarir", "noon", "almanea")
+    brand : str
+        Brand filtering (case-insensitive exact match)
+    product_group : str
+        Product group filtering (case-insensitive exact match)
+    price_min, price_max : float
+        Inclusive price_final range; either bound is optional
+    fusion : server | min_max | z_score | rrf
+        Hybrid score fusion (default from HYBRID_FUSION)
     """
+    try:
+        filters = SearchFilters(store, brand, product_group, price_min, price_max)
+    except ValueError as e:
+        return {"error": str(e)}
+
     img_bytes = await image.read() if image else None
 
-    return pipeline.run(
+    return await pipeline.run(
         text=text,
         image_bytes=img_bytes,
         mode=mode,
@@ -50,5 +69,6 @@ async def search(
         alpha=alpha,
         reranker=reranker,
         reranker_threshold=reranker_score,
-        store=store
+        filters=filters,
+        fusion=fusion
     )
@@ -0,0 +1,101 @@
+import hashlib
+from typing import Optional
+
+import numpy as np
+
+from app.cache.lru import LRUCache
+from app.config.settings import (
+    QUERY_EMBED_CACHE_SIZE,
+    QUERY_EMBED_CACHE_TTL,
+    QUERY_EMBED_CACHE_BACKEND,
+    REDIS_URL,
+)
+from app.utils.logger import logger
+
+
+def normalize_query(query: str) -> str:
+    """Casefold and collapse whitespace so trivially different queries share a key."""
+    return " ".join(query.casefold().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Query embedding cache keyed by (model name, normalized query), so
+    queries differing only in case or whitespace share one embedding.
+
+    Always keeps an in-process LRU + TTL tier. With
+    QUERY_EMBED_CACHE_BACKEND=redis a Redis tier is shared by all workers:
+    local misses are looked up there and local fills are written through.
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        maxsize: int = QUERY_EMBED_CACHE_SIZE,
+        ttl: float = QUERY_EMBED_CACHE_TTL,
+        backend: str = QUERY_EMBED_CACHE_BACKEND,
+    ):
+        self.model_name = model_name
+        self.ttl = ttl
+        self.local = LRUCache(maxsize, ttl)
+        self.shared_hits = 0
+        self.redis = None
+
+        if backend == "redis":
+            import redis.asyncio as aioredis
+
+            self.redis = aioredis.from_url(REDIS_URL)
+            logger.info(f"[QueryEmbedCache] Shared Redis tier enabled → {REDIS_URL}")
+        elif backend != "memory":
+            raise ValueError(f"Unknown QUERY_EMBED_CACHE_BACKEND={backend}")
+
+    def key(self, query: str) -> str:
+        raw = f"{self.model_name}\0{normalize_query(query)}".encode("utf-8")
+        return "qemb:" + hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    async def get(self, query: str) -> Optional[np.ndarray]:
+        key = self.key(query)
+
+        emb = self.local.get(key)
+        if emb is not None or self.redis is None:
+            return emb
+
+        try:
+            raw = await self.redis.get(key)
+        except Exception as e:
+            logger.warning(f"[QueryEmbedCache] Redis get failed: {e}")
+            return None
+
+        if raw is None:
+            return None
+
+        emb = np.frombuffer(raw, dtype=np.float32)
+        self.local.set(key, emb)
+        self.shared_hits += 1
+        return emb
+
+    async def set(self, query: str, emb: np.ndarray):
+        key = self.key(query)
+        emb = np.asarray(emb, dtype=np.float32)
+        # cached arrays are shared between requests
+        emb.flags.writeable = False
+        self.local.set(key, emb)
+
+        if self.redis is None:
+            return
+        try:
+            if self.ttl > 0:
+                await self.redis.set(key, emb.tobytes(), ex=int(self.ttl))
+            else:
+                await self.redis.set(key, emb.tobytes())
+        except Exception as e:
+            logger.warning(f"[QueryEmbedCache] Redis set failed: {e}")
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        # a Redis hit is a local miss
+        stats["misses"] -= self.shared_hits
+        stats["shared_hits"] = self.shared_hits
+        stats["backend"] = "redis" if self.redis is not None else "memory"
+        return stats
@@ -0,0 +1,41 @@
+import hashlib
+from typing import List, Optional
+
+from app.cache.lru import LRUCache
+from app.cache.query_embedding_cache import normalize_query
+from app.config.settings import RERANK_SCORE_CACHE_SIZE, RERANK_SCORE_CACHE_TTL
+
+
+class RerankScoreCache:
+    """
+    Cross-encoder scores keyed by (model, normalized query, doc id,
+    hash of the text that was scored). Editing a product's text changes
+    its key, so the old score is never served again and ages out of
+    the LRU.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        maxsize: int = RERANK_SCORE_CACHE_SIZE,
+        ttl: float = RERANK_SCORE_CACHE_TTL,
+    ):
+        self.model_name = model_name
+        self.cache = LRUCache(maxsize, ttl)
+
+    def key(self, query: str, doc_id: str, text: str) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        for part in (self.model_name, normalize_query(query), str(doc_id), text):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.digest()
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[float]]:
+        return [self.cache.get(k) for k in keys]
+
+    def set_many(self, keys: List[bytes], scores: List[float]):
+        for k, s in zip(keys, scores):
+            self.cache.set(k, s)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from app.cache.lru import LRUCache
+from app.config.settings import (
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_VERSION_CHECK_SECONDS,
+)
+from app.utils.logger import logger
+
+
+class ResponseCache:
+    """
+    Cache of full /search responses in front of SearchPipeline.
+
+    - Keys are a hash of the canonicalized request parameters.
+    - The cache is cleared whenever the concrete indices behind the
+      alias change (a reindex swapped it). This is checked at most every
+      RESPONSE_CACHE_VERSION_CHECK_SECONDS; in-place updates such as
+      delta ingest are bounded by the TTL instead.
+    - Concurrent identical requests are single-flighted: one computes,
+      the rest await its result.
+    """
+
+    def __init__(
+        self,
+        client,
+        index: str,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        check_interval: float = RESPONSE_CACHE_VERSION_CHECK_SECONDS,
+    ):
+        self.client = client
+        self.index = index
+        self.check_interval = check_interval
+
+        self.cache = LRUCache(maxsize, ttl)
+        self.coalesced = 0
+        self.invalidations = 0
+
+        self._inflight = {}             # key → asyncio.Task
+        self._version = None
+        self._generation = 0
+        self._checked_at = float("-inf")
+
+    @staticmethod
+    def key(**params) -> str:
+        raw = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    async def get_or_compute(self, key: str, compute):
+        """Cached response for `key`, else the result of `await compute()`."""
+        await self._check_version()
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # the computation runs as its own task so a disconnecting
+        # client does not cancel it for everyone waiting on it
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute):
+        generation = self._generation
+        try:
+            response = await compute()
+        finally:
+            self._inflight.pop(key, None)
+
+        # errors are not cached; neither are results from a replaced index
+        if "error" not in response and generation == self._generation:
+            self.cache.set(key, response)
+        return response
+
+    async def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        try:
+            res = await self.client.indices.get_alias(index=self.index)
+        except Exception as e:
+            logger.warning(f"[ResponseCache] Index version check failed: {e}")
+            return
+
+        version = tuple(sorted(res))
+        if self._version is not None and version != self._version:
+            logger.info(
+                f"[ResponseCache] {self.index} now → {list(version)}; "
+                f"dropping {len(self.cache)} cached responses"
+            )
+            self.cache.clear()
+            self.invalidations += 1
+            self._generation += 1
+        self._version = version
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        stats["coalesced"] = self.coalesced
+        stats["invalidations"] = self.invalidations
+        stats["index_version"] = list(self._version) if self._version else None
+        return stats
@@ -8,25 +8,150 @@ load_dotenv()
 # OpenSearch Settings
 # -----------------------------
 OPENSEARCH_URL = os.getenv("OPENSEARCH_URL", "http://localhost:9200")
+# Alias maintained by the pre_deploy loader (products → products_v{N})
 OPENSEARCH_INDEX = os.getenv("OPENSEARCH_INDEX", "products")
 OPENSEARCH_PASSWORD = os.getenv("OPENSEARCH_PASSWORD", "MyStrongPassword123!")
+# INDEX_PER_STORE: the loader split the catalog per store (pre_deploy
+# INDEX_PER_STORE=1); store-scoped queries go to the OPENSEARCH_INDEX_{store}
+# alias instead of the shared one.
+INDEX_PER_STORE = os.getenv("INDEX_PER_STORE", "false").lower() == "true"
+# Pooled connections of the async client (concurrent searches per worker)
+OPENSEARCH_POOL_MAXSIZE = int(os.getenv("OPENSEARCH_POOL_MAXSIZE", 32))
+
+# -----------------------------
+# Hybrid Search Pipelines
+# -----------------------------
+# Each alpha needs its own normalization pipeline on the cluster.
+# Alphas are rounded to 2 decimals; the preset grid is created at startup
+# and at most HYBRID_PIPELINE_CACHE_SIZE pipelines are tracked per process.
+HYBRID_PIPELINE_PRESET_ALPHAS = [
+    float(a) for a in os.getenv(
+        "HYBRID_PIPELINE_PRESET_ALPHAS",
+        "0.0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9,1.0"
+    ).split(",") if a.strip()
+]
+HYBRID_PIPELINE_CACHE_SIZE = int(os.getenv("HYBRID_PIPELINE_CACHE_SIZE", 128))
+
+# HYBRID_FUSION:
+#   "server"  → OpenSearch normalization-processor (min_max + arithmetic_mean)
+#   "min_max" | "z_score" | "rrf" → BM25 and kNN legs fetched in one _msearch
+#   and fused in-process; no search pipeline involved. Overridable per request.
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "server")
+RRF_K = int(os.getenv("RRF_K", 60))
 
 # -----------------------------
 # Embedding Model (E5 / BGE etc.)
 # -----------------------------
 EMBED_MODEL = os.getenv("EMBED_MODEL", "intfloat/e5-large")
 
+# VECTOR_PROJECTION: must match the loader (VECTOR_PROJECTION_DIM > 0 there).
+#   Query vectors are PCA-projected with the loader's artifact
+#   (PROJECTION_ARTIFACT_PATH) before quantization / search.
+VECTOR_PROJECTION = os.getenv("VECTOR_PROJECTION", "false").lower() == "true"
+PROJECTION_ARTIFACT_PATH = os.getenv("PROJECTION_ARTIFACT_PATH", "../pre_deploy/artifacts/projection.npz")
+
+# VECTOR_QUANTIZATION: must match the loader.
+#   "none" → float vectors
+#   "byte" → int8 vectors; query vectors are quantized with the loader's
+#            calibration artifact (QUANT_ARTIFACT_PATH)
+# QUANT_RESCORE: fetch QUANT_RESCORE_OVERSAMPLE × k kNN candidates and
+#   re-rank them by exact l2 on the stored full-precision vectors.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+QUANT_ARTIFACT_PATH = os.getenv("QUANT_ARTIFACT_PATH", "../pre_deploy/artifacts/quantization.json")
+QUANT_RESCORE = os.getenv("QUANT_RESCORE", "true").lower() == "true"
+QUANT_RESCORE_OVERSAMPLE = int(os.getenv("QUANT_RESCORE_OVERSAMPLE", 3))
+
+# -----------------------------
+# Vector Retrieval Backend
+# -----------------------------
+# VECTOR_BACKEND:
+#   "opensearch" → kNN queries go to the cluster
+#   "local"      → vector mode and the kNN leg of local fusion are served
+#                  in-process from the IVF snapshot the loader exports
+#                  (pre_deploy VECTOR_SNAPSHOT=1); BM25, server-side hybrid
+#                  and document fetches stay on OpenSearch. Falls back to
+#                  OpenSearch when the snapshot does not match the live index.
+# IVF_NPROBE: IVF lists scanned per query (recall vs latency)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "opensearch")
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "../pre_deploy/artifacts/vector_snapshot")
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))
+
 # -----------------------------
 # Reranker Model
 # -----------------------------
 RERANKER_MODEL = os.getenv("RERANKER_MODEL", "BAAI/bge-reranker-v2-m3")
 
+# RERANKER_PRELOAD:
+#   true  → load + warm up the reranker at API startup
+#   false → load lazily on the first reranked request
+RERANKER_PRELOAD = os.getenv("RERANKER_PRELOAD", "true").lower() == "true"
+
 # CANDIDATE_LIMIT:
 #   Maximum number of documents passed to the cross-encoder reranker.
 #   Instead of reranking all hybrid (BM25 + Vector) results, only the top N
 #   candidates are reranked to balance latency and accuracy. (Recommended: 32–64)
+#   Reranked searches retrieve max(k, CANDIDATE_LIMIT) hits as the pool.
 CANDIDATE_LIMIT = int(os.getenv("RERANK_CANDIDATE_LIMIT", 48))
 
+# RERANK_TEXT_FIELD: compact per-product text built by the indexer
+# (pre_deploy rerank_text). Indexes built before it existed can set
+# "combined_text". RERANK_MAX_LENGTH caps the cross-encoder input in
+# tokens (query + document), so latency stays bounded.
+RERANK_TEXT_FIELD = os.getenv("RERANK_TEXT_FIELD", "rerank_text")
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", 256))
+
+# Cascade reranking: candidates are scored RERANK_CHUNK_SIZE at a time in
+# retrieval order; scoring stops once the current top-k beats the whole
+# latest chunk by RERANK_EARLY_STOP_MARGIN (cross-encoder logits).
+# Set the margin to "inf" to always score all CANDIDATE_LIMIT docs.
+RERANK_CHUNK_SIZE = int(os.getenv("RERANK_CHUNK_SIZE", 16))
+RERANK_EARLY_STOP_MARGIN = float(os.getenv("RERANK_EARLY_STOP_MARGIN", 2.0))
+
+# Cross-encoder scores per (query, product text); only unseen pairs
+# reach the model.
+RERANK_SCORE_CACHE = os.getenv("RERANK_SCORE_CACHE", "true").lower() == "true"
+RERANK_SCORE_CACHE_SIZE = int(os.getenv("RERANK_SCORE_CACHE_SIZE", 200000))
+RERANK_SCORE_CACHE_TTL = float(os.getenv("RERANK_SCORE_CACHE_TTL", 86400))
+
+# -----------------------------
+# Inference Micro-Batching
+# -----------------------------
+# Concurrent requests are queued and run as one forward pass once
+# *_BATCH_MAX items are waiting or *_BATCH_WAIT_MS has passed.
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "true").lower() == "true"
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", 32))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", 5))
+RERANK_BATCH_MAX_PAIRS = int(os.getenv("RERANK_BATCH_MAX_PAIRS", 256))
+RERANK_BATCH_WAIT_MS = float(os.getenv("RERANK_BATCH_WAIT_MS", 5))
+
+# Threads for model work that is not micro-batched (keeps the event loop free)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 4))
+
+# -----------------------------
+# Query Embedding Cache
+# -----------------------------
+# Repeated queries skip the embedding forward pass.
+# QUERY_EMBED_CACHE_BACKEND:
+#   "memory" → per-process LRU only
+#   "redis"  → per-process LRU in front of a Redis shared by all workers
+QUERY_EMBED_CACHE = os.getenv("QUERY_EMBED_CACHE", "true").lower() == "true"
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", 10000))
+QUERY_EMBED_CACHE_TTL = float(os.getenv("QUERY_EMBED_CACHE_TTL", 3600))
+QUERY_EMBED_CACHE_BACKEND = os.getenv("QUERY_EMBED_CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# -----------------------------
+# Search Response Cache
+# -----------------------------
+# Whole /search responses keyed by the request parameters. Cleared when
+# the alias points at a different index (checked at most every
+# RESPONSE_CACHE_VERSION_CHECK_SECONDS); the TTL bounds staleness from
+# in-place updates such as delta ingest.
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2000))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 300))
+RESPONSE_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("RESPONSE_CACHE_VERSION_CHECK_SECONDS", 10))
+
 # -----------------------------
 # GPT Image-to-Text Model
 # Used only if image is uploaded
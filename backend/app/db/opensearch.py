@@ -1,12 +1,14 @@
-from opensearchpy import OpenSearch
+from opensearchpy import OpenSearch, AsyncOpenSearch
 from app.config.settings import (
     OPENSEARCH_URL,
     OPENSEARCH_PASSWORD,
+    OPENSEARCH_POOL_MAXSIZE,
 )
 from app.utils.logger import logger
 
 
 _client = None
+_async_client = None
 
 
 def get_client():
@@ -28,3 +30,33 @@ def get_client():
 
     logger.info("[OpenSearch] Client initialized")
     return _client
+
+
+def get_async_client():
+    """Async client used on the request path (aiohttp, pooled connections)."""
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+
+    logger.info("[OpenSearch] Initializing async client")
+
+    _async_client = AsyncOpenSearch(
+        hosts=[OPENSEARCH_URL],
+        http_auth=("admin", OPENSEARCH_PASSWORD),
+        verify_certs=False,
+        ssl_show_warn=False,
+        timeout=60,
+        max_retries=5,
+        retry_on_timeout=True,
+        maxsize=OPENSEARCH_POOL_MAXSIZE,
+    )
+
+    logger.info("[OpenSearch] Async client initialized")
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
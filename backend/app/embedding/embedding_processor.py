@@ -1,5 +1,22 @@
+import asyncio
 import torch
+import numpy as np
 from sentence_transformers import SentenceTransformer
+from app.config.settings import (
+    INFERENCE_BATCHING,
+    EMBED_BATCH_MAX,
+    EMBED_BATCH_WAIT_MS,
+    QUERY_EMBED_CACHE,
+    VECTOR_QUANTIZATION,
+    QUANT_ARTIFACT_PATH,
+    VECTOR_PROJECTION,
+    PROJECTION_ARTIFACT_PATH,
+)
+from app.cache.query_embedding_cache import QueryEmbeddingCache
+from app.embedding.projection import QueryProjection
+from app.embedding.quantization import QueryQuantizer
+from app.utils.batching import MicroBatcher
+from app.utils.executor import run_blocking
 from app.utils.logger import logger
 
 
@@ -20,6 +37,82 @@ class EmbeddingProcessor:
         self.dim = self.model.get_sentence_embedding_dimension()
         logger.info("[Embedding] Auto-detected embedding dimension: %s", self.dim)
 
+        # Concurrent query encodes share one forward pass
+        self.batcher = MicroBatcher(
+            "embedding", self.encode_batch, EMBED_BATCH_MAX, EMBED_BATCH_WAIT_MS
+        ) if INFERENCE_BATCHING else None
+
+        # PCA-reduced index → query vectors are projected with the loader's artifact
+        self.projection = None
+        space = model_name
+        if VECTOR_PROJECTION:
+            self.projection = QueryProjection.load(PROJECTION_ARTIFACT_PATH)
+            if self.projection is None:
+                raise RuntimeError("VECTOR_PROJECTION=true needs PROJECTION_ARTIFACT_PATH")
+            if self.projection.model != model_name or self.projection.in_dim != self.dim:
+                logger.warning(
+                    "[Embedding] Projection artifact is for model=%s dim=%s",
+                    self.projection.model, self.projection.in_dim
+                )
+            space = f"{model_name}+pca:{self.projection.version}"
+
+        # dimension of the vectors the index stores
+        self.index_dim = self.projection.out_dim if self.projection is not None else self.dim
+
+        # Repeated queries skip the forward pass entirely (projected vectors are
+        # cached, keyed by the projection too)
+        self.cache = QueryEmbeddingCache(space) if QUERY_EMBED_CACHE else None
+
+        # int8 index → query vectors are quantized with the loader's artifact
+        self.quantizer = None
+        if VECTOR_QUANTIZATION == "byte":
+            self.quantizer = QueryQuantizer.load(QUANT_ARTIFACT_PATH)
+            if self.quantizer is None:
+                raise RuntimeError("VECTOR_QUANTIZATION=byte needs QUANT_ARTIFACT_PATH")
+            if self.quantizer.model != space or self.quantizer.dim != self.index_dim:
+                logger.warning(
+                    "[Embedding] Quantization artifact is for model=%s dim=%s",
+                    self.quantizer.model, self.quantizer.dim
+                )
+        elif VECTOR_QUANTIZATION != "none":
+            raise ValueError(f"Unknown VECTOR_QUANTIZATION={VECTOR_QUANTIZATION}")
+
+    def encode_batch(self, texts):
+        return self.model.encode(
+            texts,
+            batch_size=max(len(texts), 1),
+            convert_to_numpy=True
+        )
+
+    async def aencode_query(self, query: str) -> np.ndarray:
+        """
+        E5 query embedding ("query: " prefix) in the index's vector space:
+        served from the query cache, else micro-batched when enabled, then projected.
+        """
+        if self.cache is not None:
+            emb = await self.cache.get(query)
+            if emb is not None:
+                return emb
+
+        text = "query: " + query
+        if self.batcher is not None:
+            emb = (await asyncio.wrap_future(self.batcher.submit([text])))[0]
+        else:
+            emb = (await run_blocking(self.encode_batch, [text]))[0]
+
+        if self.projection is not None:
+            emb = self.projection.apply(emb)
+
+        if self.cache is not None:
+            await self.cache.set(query, emb)
+        return emb
+
+    def index_vector(self, emb: np.ndarray) -> list:
+        """Query vector in the vector space of the index (int8 when quantized)."""
+        if self.quantizer is not None:
+            return self.quantizer.quantize(emb).tolist()
+        return emb.tolist()
+
     def search(self, client, index, query: str, top_k: int = 200):
         if not query:
             logger.warning("[Embedding] Empty query received. Skipping search.")
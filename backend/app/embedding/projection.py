@@ -0,0 +1,41 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.utils.logger import logger
+
+
+class QueryProjection:
+    """
+    Query side of the pre_deploy PCA projection artifact: maps a model
+    query vector into the reduced space the index was built in.
+
+        y = (x - mean) @ components.T
+    """
+
+    def __init__(self, mean, components, model: str, version: str):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.model = model
+        self.version = version
+        self.in_dim = self.components.shape[1]
+        self.out_dim = self.components.shape[0]
+
+    @classmethod
+    def load(cls, path: str) -> Optional["QueryProjection"]:
+        path = Path(path)
+        if not path.exists():
+            logger.error(f"[Projection] Artifact not found: {path}")
+            return None
+
+        with np.load(path) as data:
+            proj = cls(data["mean"], data["components"], str(data["model"]), str(data["version"]))
+        logger.info(
+            f"[Projection] Loaded artifact {proj.version} from {path} "
+            f"({proj.in_dim} → {proj.out_dim} dims)"
+        )
+        return proj
+
+    def apply(self, vector: np.ndarray) -> np.ndarray:
+        return (np.asarray(vector, dtype=np.float32) - self.mean) @ self.components.T
@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.utils.logger import logger
+
+QMIN, QMAX = -128, 127
+
+
+class QueryQuantizer:
+    """
+    Query side of the pre_deploy int8 quantization artifact: maps a float
+    query vector into the same byte space as the indexed vectors.
+
+        q = clip(round((x - offset) * scale), -128, 127)
+    """
+
+    def __init__(self, offset, scale, model: str, version: str):
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.model = model
+        self.version = version
+        self.dim = len(self.offset)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["QueryQuantizer"]:
+        path = Path(path)
+        if not path.exists():
+            logger.error(f"[Quantization] Artifact not found: {path}")
+            return None
+
+        data = json.loads(path.read_text())
+        logger.info(f"[Quantization] Loaded artifact {data['version']} from {path}")
+        return cls(data["offset"], data["scale"], data["model"], data["version"])
+
+    def quantize(self, vector: np.ndarray) -> np.ndarray:
+        q = np.rint((np.asarray(vector, dtype=np.float32) - self.offset) * self.scale)
+        return np.clip(q, QMIN, QMAX).astype(np.int8)
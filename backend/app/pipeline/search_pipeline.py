@@ -1,16 +1,28 @@
-from app.db.opensearch import get_client
+import hashlib
+from app.db.opensearch import get_async_client
+from app.cache.response_cache import ResponseCache
 from app.preprocessing.text_processor import TextProcessor
 from app.preprocessing.image_processor import ImageProcessor
 from app.preprocessing.input_router import InputRouter
 from app.processors.search_processor import SearchProcessor
+from app.processors.fields import retrieval_fields, missing_fields
+from app.ranking.fusion import FUSION_METHODS
+from app.ranking.reranker_processor import aget_reranker, get_loaded_reranker, rerank_depth
 from app.utils.path_utils import build_full_image_paths
-from app.config.settings import OPENSEARCH_INDEX, EMBED_MODEL
+from app.config.settings import (
+    OPENSEARCH_INDEX,
+    EMBED_MODEL,
+    HYBRID_PIPELINE_PRESET_ALPHAS,
+    HYBRID_FUSION,
+    RERANKER_PRELOAD,
+    RESPONSE_CACHE,
+)
 from app.utils.logger import logger
 
 
 class SearchPipeline:
     def __init__(self):
-        self.client = get_client()
+        self.client = get_async_client()
 
         self.text_proc = TextProcessor()
         self.image_proc = ImageProcessor()
@@ -22,7 +34,36 @@ class SearchPipeline:
             model_name=EMBED_MODEL
         )
 
-    def run(
+        self.responses = ResponseCache(self.client, OPENSEARCH_INDEX) if RESPONSE_CACHE else None
+
+    async def warmup(self):
+        """Startup work that would otherwise land on the first requests."""
+        try:
+            await self.searcher.pipelines.preload(HYBRID_PIPELINE_PRESET_ALPHAS)
+        except Exception as e:
+            logger.warning(f"[SearchPipeline] Hybrid pipeline preload failed: {e}")
+
+        try:
+            await self.searcher.check_vector_artifacts()
+        except Exception as e:
+            logger.warning(f"[SearchPipeline] Vector artifact check failed: {e}")
+
+        if RERANKER_PRELOAD:
+            await aget_reranker()
+
+    def cache_stats(self) -> dict:
+        cache = self.searcher.embed_proc.cache
+        reranker_proc = get_loaded_reranker()
+        return {
+            "query_embedding": cache.stats() if cache is not None else None,
+            "response": self.responses.stats() if self.responses is not None else None,
+            "rerank_score": (
+                reranker_proc.cache.stats()
+                if reranker_proc is not None and reranker_proc.cache is not None else None
+            ),
+        }
+
+    async def run(
         self,
         text=None,
         image_bytes=None,
@@ -31,31 +72,67 @@ class SearchPipeline:
         alpha=0.5,
         reranker=True,
         reranker_threshold=0.0,
-        store=None
+        filters=None,
+        fusion=None
     ):
         clean = self.text_proc.process(text) if text else ""
-        img_txt = self.image_proc.process(image_bytes) if image_bytes else ""
+
+        if self.responses is None:
+            return await self._run(
+                clean, image_bytes, mode, k, alpha, reranker, reranker_threshold, filters, fusion
+            )
+
+        key = ResponseCache.key(
+            text=clean,
+            image=hashlib.blake2b(image_bytes, digest_size=16).hexdigest() if image_bytes else None,
+            mode=mode,
+            k=int(k),
+            alpha=float(alpha) if mode == "hybrid" else None,
+            reranker=bool(reranker),
+            threshold=float(reranker_threshold or 0) if reranker else None,
+            filters=filters.as_dict() if filters else None,
+            fusion=(fusion or HYBRID_FUSION) if mode == "hybrid" else None,
+        )
+        return await self.responses.get_or_compute(
+            key,
+            lambda: self._run(
+                clean, image_bytes, mode, k, alpha, reranker, reranker_threshold, filters, fusion
+            ),
+        )
+
+    async def _run(
+        self, clean, image_bytes, mode, k, alpha, reranker, reranker_threshold, filters, fusion
+    ):
+        img_txt = await self.image_proc.process(image_bytes) if image_bytes else ""
 
         query = self.router.merge(clean, img_txt)
 
         if not query:
             return {"error": "Empty query"}
+        if fusion and fusion not in FUSION_METHODS:
+            return {"error": f"Invalid fusion={fusion}"}
         logger.warning(
             f"[DEBUG] mode={mode}, k={k}, alpha={alpha}, reranker={reranker}, "
-            f"threshold={reranker_threshold}, query={query}, store={store}"
+            f"threshold={reranker_threshold}, query={query}, filters={filters}, fusion={fusion}"
         )
 
+        # Only ranking inputs are fetched here; DTO fields come later for top-k
+        fields = retrieval_fields(reranker)
+
+        # the reranker gets a deeper pool than k and the cut to k happens after it
+        depth = rerank_depth(k) if reranker else k
+
         # ------------------------------------------------
         # RETRIEVAL MODES
         # ------------------------------------------------
         if mode == "keyword":
-            hits = self.searcher.keyword(query, k, store)
+            hits = await self.searcher.keyword(query, depth, filters, fields)
 
         elif mode == "vector":
-            hits = self.searcher.vector(query, k, store)
+            hits = await self.searcher.vector(query, depth, filters, fields)
 
         elif mode == "hybrid":
-            hits = self.searcher.hybrid(query, k, alpha, store)
+            hits = await self.searcher.hybrid(query, depth, alpha, filters, fusion, fields)
 
         else:
             return {"error": f"Invalid mode={mode}"}
@@ -64,26 +141,24 @@ class SearchPipeline:
         # RERANKING
         # ------------------------------------------------
         if reranker:
-            from app.ranking.reranker_processor import RerankerProcessor
-            self.reranker = RerankerProcessor()
-
-            hits = self.reranker.rerank(query, hits)
+            reranker_proc = await aget_reranker()
+            hits = await reranker_proc.rerank(query, hits, k)
 
+            # docs the cascade never scored cannot pass a threshold
             if reranker_threshold:
                 hits = [
                     h for h in hits
-                    if float(h.get("rerank_score", 0)) >= reranker_threshold
+                    if "rerank_score" in h
+                    and float(h["rerank_score"]) >= reranker_threshold
                 ]
 
         # ------------------------------------------------
         # BUILD RESPONSE DTO
         # ------------------------------------------------
-        results = []
-        for h in hits[:k]:
-            src = h["_source"]
+        hits = await self.searcher.hydrate(hits[:k], missing_fields(fields))
 
         results = []
-        for h in hits[:k]:
+        for h in hits:
             src = h["_source"]
 
             results.append({
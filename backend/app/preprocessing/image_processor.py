@@ -2,8 +2,8 @@ import base64
 from app.config.settings import IMAGE_TO_TEXT_MODEL, OPENAI_API_KEY
 from app.utils.logger import logger
 
-from openai import OpenAI
-client = OpenAI(api_key=OPENAI_API_KEY)
+from openai import AsyncOpenAI
+client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
 IMAGE_TO_TEXT_PROMPT = """
 You are an e-commerce vision assistant for a semantic search system.
@@ -93,7 +93,7 @@ class ImageProcessor:
     def __init__(self):
         logger.info("[ImageProcessor] Initialized using model: %s", IMAGE_TO_TEXT_MODEL)
 
-    def process(self, image_bytes: bytes) -> str:
+    async def process(self, image_bytes: bytes) -> str:
         logger.debug("[ImageProcessor] Starting process()")
 
         if not image_bytes:
@@ -106,7 +106,7 @@ class ImageProcessor:
         encoded = base64.b64encode(image_bytes).decode("utf-8")
 
         # OpenAI Vision via chat.completions
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=IMAGE_TO_TEXT_MODEL,
             messages=[
                 {
@@ -0,0 +1,40 @@
+"""
+_source projection per search stage.
+
+Retrieval fetches only what ranking needs; the response DTO fields are
+fetched with one mget for the final top-k hits (SearchProcessor.hydrate).
+The `embedding` vector is never returned.
+"""
+
+from app.config.settings import RERANK_TEXT_FIELD
+
+# always fetched at retrieval
+RETRIEVAL_FIELDS = ["id"]
+
+# text the cross-encoder scores (see RerankerProcessor.rerank)
+RERANK_FIELDS = [RERANK_TEXT_FIELD, "title_en"]
+
+# fields read by SearchPipeline when building the response DTO
+RESPONSE_FIELDS = [
+    "id",
+    "title_en",
+    "title_ar",
+    "brand",
+    "url",
+    "price_final",
+    "currency",
+    "product_group",
+    "image_paths",
+    "store",
+]
+
+
+def retrieval_fields(rerank: bool) -> list:
+    fields = list(RETRIEVAL_FIELDS)
+    if rerank:
+        fields += [f for f in RERANK_FIELDS if f not in fields]
+    return fields
+
+
+def missing_fields(fetched: list, wanted: list = RESPONSE_FIELDS) -> list:
+    return [f for f in wanted if f not in fetched]
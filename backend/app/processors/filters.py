@@ -0,0 +1,89 @@
+import re
+from typing import Optional
+
+
+def store_key(store: str) -> str:
+    """Store part of a per-store index alias (same rule as pre_deploy store_key)."""
+    return re.sub(r"[^a-z0-9]+", "_", store.lower()).strip("_") or "unknown"
+
+
+class SearchFilters:
+    """
+    Structured filters pushed into retrieval.
+
+    Keyword values are matched against fields the indexer maps as
+    `keyword` with a lowercase normalizer, so they are compared
+    case-insensitively. The price range applies to `price_final` and
+    either bound may be omitted.
+
+    The same clauses go into the BM25 bool filter and into the knn
+    clause's `filter` (efficient filtering: the HNSW search only visits
+    matching documents), so a filtered query returns k hits whenever k
+    matching documents exist.
+    """
+
+    TERM_FIELDS = ("store", "brand", "product_group")
+
+    def __init__(
+        self,
+        store: Optional[str] = None,
+        brand: Optional[str] = None,
+        product_group: Optional[str] = None,
+        price_min: Optional[float] = None,
+        price_max: Optional[float] = None,
+    ):
+        self.store = self._norm(store)
+        self.brand = self._norm(brand)
+        self.product_group = self._norm(product_group)
+        self.price_min = float(price_min) if price_min is not None else None
+        self.price_max = float(price_max) if price_max is not None else None
+
+        if (
+            self.price_min is not None
+            and self.price_max is not None
+            and self.price_min > self.price_max
+        ):
+            raise ValueError(f"price_min={self.price_min} > price_max={self.price_max}")
+
+    @staticmethod
+    def _norm(value: Optional[str]) -> Optional[str]:
+        value = (value or "").strip().lower()
+        return value or None
+
+    def clauses(self) -> list:
+        out = [
+            {"term": {field: getattr(self, field)}}
+            for field in self.TERM_FIELDS
+            if getattr(self, field)
+        ]
+
+        price = {}
+        if self.price_min is not None:
+            price["gte"] = self.price_min
+        if self.price_max is not None:
+            price["lte"] = self.price_max
+        if price:
+            out.append({"range": {"price_final": price}})
+
+        return out
+
+    def query(self) -> Optional[dict]:
+        """Bool filter for the clauses, or None when nothing is filtered."""
+        clauses = self.clauses()
+        return {"bool": {"filter": clauses}} if clauses else None
+
+    def as_dict(self) -> dict:
+        return {
+            "store": self.store,
+            "brand": self.brand,
+            "product_group": self.product_group,
+            "price_min": self.price_min,
+            "price_max": self.price_max,
+        }
+
+    def __bool__(self):
+        return bool(self.clauses())
+
+    def __repr__(self):
+        active = {k: v for k, v in self.as_dict().items() if v is not None}
+        return f"SearchFilters({active})"
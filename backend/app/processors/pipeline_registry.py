@@ -0,0 +1,84 @@
+import time
+import asyncio
+from collections import OrderedDict
+from app.config.settings import HYBRID_PIPELINE_CACHE_SIZE
+from app.utils.logger import logger
+
+
+class HybridPipelineRegistry:
+    """
+    Tracks the hybrid normalization pipelines that exist on the cluster.
+    Each alpha is PUT at most once per process; a bounded LRU keeps the
+    set of known pipelines small for arbitrary alphas.
+    """
+
+    def __init__(self, client, max_size: int = HYBRID_PIPELINE_CACHE_SIZE):
+        self.client = client
+        self.max_size = max_size
+        self._known = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def normalize(alpha: float) -> float:
+        return round(min(max(float(alpha), 0.0), 1.0), 2)
+
+    def name(self, alpha: float) -> str:
+        return f"hybrid-a{self.normalize(alpha)}"
+
+    async def ensure(self, alpha: float) -> str:
+        """Return the pipeline name for alpha, creating it on first use."""
+        alpha = self.normalize(alpha)
+        name = self.name(alpha)
+
+        # fast path: known pipelines never wait on the lock
+        if name in self._known:
+            self._known.move_to_end(name)
+            return name
+
+        async with self._lock:
+            if name in self._known:
+                return name
+
+            await self._put(alpha, name)
+            self._known[name] = alpha
+            if len(self._known) > self.max_size:
+                self._known.popitem(last=False)
+
+        return name
+
+    async def invalidate(self, alpha: float):
+        """Forget a pipeline (e.g. the cluster was reset) so it is PUT again."""
+        async with self._lock:
+            self._known.pop(self.name(alpha), None)
+
+    async def preload(self, alphas):
+        start = time.perf_counter()
+        for alpha in alphas:
+            await self.ensure(alpha)
+        elapsed = time.perf_counter() - start
+        logger.info(f"[PipelineRegistry] Preloaded {len(alphas)} pipelines in {elapsed:.4f} sec")
+
+    async def _put(self, alpha: float, name: str):
+        body = {
+            "phase_results_processors": [
+                {
+                    "normalization-processor": {
+                        "normalization": {"technique": "min_max"},
+                        "combination": {
+                            "technique": "arithmetic_mean",
+                            "parameters": {"weights": [1 - alpha, alpha]}
+                        }
+                    }
+                }
+            ]
+        }
+
+        start = time.perf_counter()
+        await self.client.transport.perform_request(
+            method="PUT",
+            url=f"/_search/pipeline/{name}",
+            body=body,
+        )
+        elapsed = time.perf_counter() - start
+
+        logger.info(f"[PipelineRegistry] Pipeline PUT {name} duration: {elapsed:.4f} sec")
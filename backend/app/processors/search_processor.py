@@ -1,38 +1,73 @@
 import time
+import asyncio
+import numpy as np
+from opensearchpy.exceptions import NotFoundError, RequestError
 from app.utils.logger import logger
 from app.embedding.embedding_processor import EmbeddingProcessor
+from app.processors.pipeline_registry import HybridPipelineRegistry
+from app.processors.fields import missing_fields
+from app.processors.filters import store_key
+from app.ranking.fusion import FUSION_METHODS, fuse
+from app.retrieval.ivf_index import IVFIndex
+from app.utils.executor import run_blocking
+from app.config.settings import (
+    HYBRID_FUSION,
+    RRF_K,
+    INDEX_PER_STORE,
+    QUANT_RESCORE,
+    QUANT_RESCORE_OVERSAMPLE,
+    VECTOR_BACKEND,
+    VECTOR_SNAPSHOT_DIR,
+    IVF_NPROBE,
+)
 
 
 class SearchProcessor:
 
     def __init__(self, client, index, model_name):
+        # checked before the model loads: a bad default would fail every hybrid query
+        if HYBRID_FUSION not in FUSION_METHODS:
+            raise ValueError(
+                f"Unknown HYBRID_FUSION={HYBRID_FUSION} (expected one of {', '.join(FUSION_METHODS)})"
+            )
+
         self.client = client
         self.index = index
 
         # Load embedding model ONCE
         self.embed_proc = EmbeddingProcessor(model_name)
 
+        # Hybrid normalization pipelines, PUT at most once per alpha
+        self.pipelines = HybridPipelineRegistry(client)
+
+        # int8 kNN candidates are re-ranked by exact l2 on embedding_fp32
+        self.rescore = self.embed_proc.quantizer is not None and QUANT_RESCORE
+
+        # In-process kNN over the loader's IVF snapshot (float vectors, no rescoring)
+        self.local = None
+        if VECTOR_BACKEND == "local":
+            self.local = IVFIndex.load(VECTOR_SNAPSHOT_DIR, IVF_NPROBE)
+            if self.local is None:
+                raise RuntimeError("VECTOR_BACKEND=local needs VECTOR_SNAPSHOT_DIR")
+            if self.local.dim != self.embed_proc.index_dim:
+                raise RuntimeError(
+                    f"Vector snapshot has dim={self.local.dim}, "
+                    f"queries have dim={self.embed_proc.index_dim}"
+                )
+        elif VECTOR_BACKEND != "opensearch":
+            raise ValueError(f"Unknown VECTOR_BACKEND={VECTOR_BACKEND}")
+
     # --------------------------------------------------
     # KEYWORD
     # --------------------------------------------------
-    def keyword(self, query, k, store=None):
-        logger.info(f"[SearchProcessor] Keyword search → k={k}")
-
-        body = {
-            "size": k,
-            "query": {"match": {"combined_text": query}}
-        }
+    async def keyword(self, query, k, filters=None, fields=None):
+        logger.info(f"[SearchProcessor] Keyword search → k={k}, filters={filters}")
 
-        if store:
-            body["query"] = {
-                "bool": {
-                    "must": body["query"],
-                    "filter": {"term": {"store": store.lower()}}
-                }
-            }
+        body = self._keyword_body(query, k, filters, fields)
+        index = self._target(filters)
 
         start = time.perf_counter()
-        res = self.client.search(index=self.index, body=body)
+        res = await self.client.search(index=index, body=body, params=self._params(index))
         elapsed = time.perf_counter() - start
 
         logger.info(f"[SearchProcessor] Keyword duration: {elapsed:.4f} sec")
@@ -41,68 +76,39 @@ class SearchProcessor:
     # --------------------------------------------------
     # VECTOR SEARCH
     # --------------------------------------------------
-    def vector(self, query, k, store=None):
-        logger.info(f"[SearchProcessor] Vector search → k={k}")
+    async def vector(self, query, k, filters=None, fields=None):
+        logger.info(f"[SearchProcessor] Vector search → k={k}, filters={filters}")
 
-        emb = self.embed_proc.model.encode(
-            "query: " + query,
-            convert_to_numpy=True
-        )
+        emb = await self.embed_proc.aencode_query(query)
 
-        body = {
-            "size": k,
-            "query": {
-                "knn": {
-                    "embedding": {
-                        "vector": emb.tolist(),
-                        "k": k
-                    }
-                }
-            }
-        }
+        if self.local is not None:
+            return await self._local_knn(emb, k, filters, fields)
 
-        if store:
-            body["query"] = {
-                "bool": {
-                    "must": body["query"],
-                    "filter": {"term": {"store": store.lower()}}
-                }
-            }
+        body = self._vector_body(emb, k, filters, fields)
+        index = self._target(filters)
 
         start = time.perf_counter()
-        res = self.client.search(index=self.index, body=body)
+        res = await self.client.search(index=index, body=body, params=self._params(index))
         elapsed = time.perf_counter() - start
 
         logger.info(f"[SearchProcessor] Vector duration: {elapsed:.4f} sec")
-        return res["hits"]["hits"]
+        return self._rescored(emb, res["hits"]["hits"], k)
 
     # --------------------------------------------------
     # HYBRID (RAW)
     # --------------------------------------------------
-    def get_hybrid_raw(self, query, k, alpha, store=None):
-        logger.info(f"[SearchProcessor] Hybrid(raw) → k={k}, alpha={alpha}, store={store}")
+    async def get_hybrid_raw(self, query, k, alpha, filters=None, fields=None):
+        logger.info(f"[SearchProcessor] Hybrid(raw) → k={k}, alpha={alpha}, filters={filters}")
 
-        emb = self.embed_proc.model.encode(
-            "query: " + query,
-            convert_to_numpy=True
-        )
+        emb = await self.embed_proc.aencode_query(query)
 
-        pipeline = f"hybrid-a{alpha}"
-        self._update_pipeline(alpha, pipeline)
-        params = {"search_pipeline": pipeline}
+        pipeline = await self.pipelines.ensure(alpha)
 
         query_body = {
             "hybrid": {
                 "queries": [
-                    {"match": {"combined_text": query}},
-                    {
-                        "knn": {
-                            "embedding": {
-                                "vector": emb.tolist(),
-                                "k": k
-                            }
-                        }
-                    }
+                    self._match_clause(query, filters),
+                    self._knn_clause(emb, k, filters),
                 ]
             }
         }
@@ -111,67 +117,286 @@ class SearchProcessor:
             "size": k,
             "query": query_body
         }
+        if fields is not None:
+            body["_source"] = fields
 
-        # post_filter applies AFTER scoring & ranking
-        if store:
-            body["post_filter"] = {
-                "term": {"store": store.lower()}
-            }
+        index = self._target(filters)
 
         start = time.perf_counter()
-        res = self.client.search(index=self.index, body=body, params=params)
+        try:
+            res = await self.client.search(
+                index=index, body=body, params={"search_pipeline": pipeline, **self._params(index)}
+            )
+        except (NotFoundError, RequestError) as e:
+            # pipeline vanished (cluster reset) → recreate once and retry
+            if "pipeline" not in str(e):
+                raise
+            logger.warning(f"[SearchProcessor] Pipeline {pipeline} missing, recreating")
+            await self.pipelines.invalidate(alpha)
+            pipeline = await self.pipelines.ensure(alpha)
+            res = await self.client.search(
+                index=index, body=body, params={"search_pipeline": pipeline, **self._params(index)}
+            )
         elapsed = time.perf_counter() - start
 
         logger.info(f"[SearchProcessor] Hybrid(raw) duration: {elapsed:.4f} sec")
         return res["hits"]["hits"]
 
     # --------------------------------------------------
-    # HYBRID FILTERED + RESTRICTED (TRUE USER EXPECTATION)
+    # HYBRID (FILTERED)
     # --------------------------------------------------
-    def hybrid(self, query, k, alpha, store=None):
+    async def hybrid(self, query, k, alpha, filters=None, fusion=None, fields=None):
+        fusion = fusion or HYBRID_FUSION
         logger.info(
-            f"[SearchProcessor] Hybrid(filtered) → k={k}, alpha={alpha}, store={store}"
+            f"[SearchProcessor] Hybrid(filtered) → k={k}, alpha={alpha}, "
+            f"filters={filters}, fusion={fusion}"
         )
 
-        # Expand pool — ensure we find enough store-matching products
-        expanded_k = max(k * 4, 200)
-        raw_hits = self.get_hybrid_raw(query, expanded_k, alpha)
+        # filters run inside both legs, so k hits come back whenever k match;
+        # callers that rerank pass the rerank depth as k (see rerank_depth)
+        if fusion != "server":
+            return (await self.get_hybrid_fused(query, k, alpha, fusion, filters, fields))[:k]
+
+        return await self.get_hybrid_raw(query, k, alpha, filters, fields)
 
-        if store:
-            filtered = [
-                x for x in raw_hits
-                if x["_source"]["store"].lower() == store.lower()
-            ]
+    # --------------------------------------------------
+    # HYBRID (CLIENT-SIDE FUSION)
+    # --------------------------------------------------
+    async def get_hybrid_fused(self, query, k, alpha, method, filters=None, fields=None):
+        """
+        BM25 and kNN legs in one _msearch round trip (or BM25 alongside the
+        in-process kNN with VECTOR_BACKEND=local), fused in-process.
+        Alpha and method are free per request; no search pipeline is used.
+        """
+        logger.info(
+            f"[SearchProcessor] Hybrid(fused) → k={k}, alpha={alpha}, method={method}"
+        )
+
+        emb = await self.embed_proc.aencode_query(query)
+
+        if self.local is not None:
+            legs = await self._local_legs(query, emb, k, filters, fields)
         else:
-            filtered = raw_hits
+            legs = await self._remote_legs(query, emb, k, filters, fields)
+
+        start = time.perf_counter()
+        hits = fuse(legs[0], legs[1], alpha, method, RRF_K)
+        elapsed = time.perf_counter() - start
+        logger.info(f"[SearchProcessor] Fusion ({method}) duration: {elapsed:.4f} sec")
 
-        # Final slice (top-K)
-        return filtered[:k]
+        return hits
+
+    async def _remote_legs(self, query, emb, k, filters=None, fields=None):
+        """Both legs from OpenSearch in one _msearch."""
+        index = self._target(filters)
+        header = {"index": index}
+        if index != self.index:
+            header["ignore_unavailable"] = True
+        body = [
+            header, self._keyword_body(query, k, filters, fields),
+            header, self._vector_body(emb, k, filters, fields),
+        ]
+
+        start = time.perf_counter()
+        res = await self.client.msearch(body=body)
+        elapsed = time.perf_counter() - start
+        logger.info(f"[SearchProcessor] Hybrid(fused) msearch duration: {elapsed:.4f} sec")
+
+        legs = []
+        for name, r in zip(("keyword", "vector"), res["responses"]):
+            if "error" in r:
+                logger.error(f"[SearchProcessor] {name} leg failed: {r['error']}")
+                legs.append([])
+            else:
+                legs.append(r["hits"]["hits"])
+        legs[1] = self._rescored(emb, legs[1], k)
+        return legs
+
+    async def _local_legs(self, query, emb, k, filters=None, fields=None):
+        """BM25 leg from OpenSearch while the kNN leg runs in-process."""
+        keyword, vector = await asyncio.gather(
+            self.keyword(query, k, filters, fields),
+            self._local_knn(emb, k, filters, fields),
+            return_exceptions=True,
+        )
+        legs = []
+        for name, leg in (("keyword", keyword), ("vector", vector)):
+            if isinstance(leg, Exception):
+                logger.error(f"[SearchProcessor] {name} leg failed: {leg}")
+                legs.append([])
+            else:
+                legs.append(leg)
+        return legs
 
     # --------------------------------------------------
-    # CREATE/UPDATE HYBRID PIPELINE
+    # IN-PROCESS kNN
     # --------------------------------------------------
-    def _update_pipeline(self, alpha, name):
-        body = {
-            "phase_results_processors": [
-                {
-                    "normalization-processor": {
-                        "normalization": {"technique": "min_max"},
-                        "combination": {
-                            "technique": "arithmetic_mean",
-                            "parameters": {"weights": [1 - alpha, alpha]}
-                        }
-                    }
-                }
-            ]
+    async def _local_knn(self, emb, k, filters=None, fields=None):
+        """
+        kNN from the IVF snapshot. Hits carry the fields the snapshot
+        stored; only fields it lacks (older snapshots: all but id) are
+        fetched with the same mget hydration the DTO uses.
+        """
+        start = time.perf_counter()
+        hits = await run_blocking(self.local.search, emb, k, filters)
+        elapsed = time.perf_counter() - start
+        logger.info(f"[SearchProcessor] Local kNN duration: {elapsed:.4f} sec")
+
+        wanted = missing_fields(self.local.source_fields, fields) if fields is not None else True
+        return await self.hydrate(hits, wanted)
+
+    # --------------------------------------------------
+    # QUANTIZED kNN RESCORING
+    # --------------------------------------------------
+    def _rescored(self, emb, hits, k):
+        """
+        Re-rank oversampled int8 kNN hits by exact l2 against their
+        embedding_fp32, scored 1 / (1 + d²) like the lucene l2 space.
+        """
+        if not self.rescore or not hits:
+            return hits
+
+        start = time.perf_counter()
+        dim = len(emb)
+        vecs = np.array([
+            h["_source"].pop("embedding_fp32", None) or np.full(dim, np.inf)
+            for h in hits
+        ], dtype=np.float32)
+        d2 = ((vecs - np.asarray(emb, dtype=np.float32)) ** 2).sum(axis=1)
+
+        for h, score in zip(hits, 1.0 / (1.0 + d2)):
+            h["_score"] = float(score)
+        hits.sort(key=lambda h: h["_score"], reverse=True)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"[SearchProcessor] Rescored {len(hits)} kNN hits in {elapsed:.4f} sec")
+        return hits[:k]
+
+    async def check_vector_artifacts(self):
+        """
+        Warn when the live index was built with different projection /
+        quantization artifacts; drop a vector snapshot of other indices.
+        """
+        expected = {
+            name: artifact.version if artifact is not None else None
+            for name, artifact in (
+                ("projection", self.embed_proc.projection),
+                ("quantization", self.embed_proc.quantizer),
+            )
         }
+        mappings = await self.client.indices.get_mapping(index=self.index)
+
+        # a snapshot of other indices would return stale or missing documents
+        if self.local is not None:
+            if sorted(mappings) != sorted(self.local.indices) or (
+                self.local.projection != expected["projection"]
+            ):
+                logger.warning(
+                    f"[SearchProcessor] Vector snapshot is for {self.local.indices}, "
+                    f"live index is {sorted(mappings)}; falling back to OpenSearch kNN "
+                    f"until the snapshot is re-exported and the backend restarted"
+                )
+                self.local = None
+
+        for index, m in mappings.items():
+            meta = m["mappings"].get("_meta", {})
+            for name, version in expected.items():
+                if meta.get(name) != version:
+                    logger.warning(
+                        f"[SearchProcessor] {index} {name}={meta.get(name)}, "
+                        f"backend expects {version}; restart after the loader refits"
+                    )
+
+    # --------------------------------------------------
+    # INDEX ROUTING
+    # --------------------------------------------------
+    def _target(self, filters=None):
+        """
+        Store-scoped queries go straight to the store's own (smaller) index
+        when the catalog is split per store; everything else uses the alias.
+        """
+        if INDEX_PER_STORE and filters and filters.store:
+            return f"{self.index}_{store_key(filters.store)}"
+        return self.index
+
+    def _params(self, index):
+        # a store without an index simply has no products
+        return {"ignore_unavailable": "true"} if index != self.index else {}
+
+    # --------------------------------------------------
+    # LAZY FIELD HYDRATION
+    # --------------------------------------------------
+    async def hydrate(self, hits, fields):
+        """
+        Fetch `fields` for `hits` (the final top-k) with one mget and merge
+        them into each hit's _source. Retrieval only projected what
+        ranking needed; hits that already carry every field (local kNN
+        hits from the snapshot) are skipped.
+        """
+        if not hits or not fields:
+            return hits
+
+        # fields=True fetches the whole _source
+        todo = hits if fields is True else [
+            h for h in hits if missing_fields(h.get("_source", {}), fields)
+        ]
+        if not todo:
+            return hits
+
+        docs = [
+            {"_index": h["_index"], "_id": h["_id"], "_source": fields}
+            for h in todo
+        ]
 
         start = time.perf_counter()
-        self.client.transport.perform_request(
-            method="PUT",
-            url=f"/_search/pipeline/{name}",
-            body=body,
-        )
+        res = await self.client.mget(body={"docs": docs})
         elapsed = time.perf_counter() - start
+        logger.info(f"[SearchProcessor] Hydrated {len(todo)} hits in {elapsed:.4f} sec")
+
+        for h, doc in zip(todo, res["docs"]):
+            if doc.get("found"):
+                h.setdefault("_source", {}).update(doc["_source"])
+        return hits
+
+    # --------------------------------------------------
+    # QUERY BODIES
+    # --------------------------------------------------
+    def _match_clause(self, query, filters=None):
+        match = {"match": {"combined_text": query}}
+        if not filters:
+            return match
+        return {"bool": {"must": match, "filter": filters.clauses()}}
+
+    def _knn_clause(self, emb, k, filters=None):
+        knn = {
+            "vector": self.embed_proc.index_vector(emb),
+            "k": k
+        }
+        # efficient filtering: HNSW only visits matching docs, so k hits
+        # come back whenever k matching docs exist
+        if filters:
+            knn["filter"] = filters.query()
+        return {"knn": {"embedding": knn}}
+
+    def _keyword_body(self, query, k, filters=None, fields=None):
+        body = {
+            "size": k,
+            "query": self._match_clause(query, filters)
+        }
+        if fields is not None:
+            body["_source"] = fields
+        return body
 
-        logger.info(f"[SearchProcessor] Pipeline PUT duration: {elapsed:.4f} sec")
+    def _vector_body(self, emb, k, filters=None, fields=None):
+        if self.rescore:
+            k *= QUANT_RESCORE_OVERSAMPLE
+            if fields is not None:
+                fields = fields + ["embedding_fp32"]
+
+        body = {
+            "size": k,
+            "query": self._knn_clause(emb, k, filters)
+        }
+        if fields is not None:
+            body["_source"] = fields
+        return body
@@ -0,0 +1,70 @@
+import numpy as np
+
+# Fusion methods computed in-process (no search pipeline needed).
+# "server" keeps using the OpenSearch normalization-processor.
+LOCAL_FUSION_METHODS = ("min_max", "z_score", "rrf")
+FUSION_METHODS = ("server",) + LOCAL_FUSION_METHODS
+
+
+def min_max(scores: np.ndarray) -> np.ndarray:
+    if scores.size == 0:
+        return scores
+    lo, hi = scores.min(), scores.max()
+    if hi == lo:
+        return np.ones_like(scores)
+    return (scores - lo) / (hi - lo)
+
+
+def z_score(scores: np.ndarray) -> np.ndarray:
+    if scores.size == 0:
+        return scores
+    std = scores.std()
+    if std == 0:
+        return np.zeros_like(scores)
+    return (scores - scores.mean()) / std
+
+
+def _leg_scores(hits, method: str, rrf_k: int) -> np.ndarray:
+    if method == "rrf":
+        return 1.0 / (rrf_k + np.arange(1, len(hits) + 1, dtype=np.float64))
+
+    raw = np.array([float(h.get("_score") or 0.0) for h in hits], dtype=np.float64)
+    return min_max(raw) if method == "min_max" else z_score(raw)
+
+
+def fuse(lexical_hits, vector_hits, alpha: float, method: str = "min_max", rrf_k: int = 60):
+    """
+    Fuse a BM25 leg and a kNN leg into one ranked hit list.
+
+    Each leg is normalized independently (min-max, z-score or reciprocal
+    rank) and combined as (1 - alpha) * lexical + alpha * vector, the same
+    weighting the server-side hybrid pipeline uses. A document missing from
+    a leg gets that leg's floor (0 for min-max / RRF, the leg minimum for
+    z-score).
+    """
+    if method not in LOCAL_FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    docs = {}
+    for h in list(lexical_hits) + list(vector_hits):
+        docs.setdefault(h["_id"], h)
+    ids = list(docs)
+    pos = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    fused = np.zeros(len(ids), dtype=np.float64)
+    for hits, weight in ((lexical_hits, 1.0 - alpha), (vector_hits, alpha)):
+        scores = _leg_scores(hits, method, rrf_k)
+        floor = scores.min() if method == "z_score" and scores.size else 0.0
+
+        leg = np.full(len(ids), floor, dtype=np.float64)
+        leg[[pos[h["_id"]] for h in hits]] = scores
+        fused += weight * leg
+
+    order = np.argsort(-fused, kind="stable")
+
+    results = []
+    for i in order:
+        hit = dict(docs[ids[i]])
+        hit["_score"] = float(fused[i])
+        results.append(hit)
+    return results
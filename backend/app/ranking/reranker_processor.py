@@ -1,54 +1,210 @@
+import asyncio
+import threading
+import numpy as np
 from FlagEmbedding import FlagReranker
+from app.config.settings import (
+    RERANKER_MODEL,
+    INFERENCE_BATCHING,
+    RERANK_BATCH_MAX_PAIRS,
+    RERANK_BATCH_WAIT_MS,
+    RERANK_SCORE_CACHE,
+    CANDIDATE_LIMIT,
+    RERANK_CHUNK_SIZE,
+    RERANK_EARLY_STOP_MARGIN,
+    RERANK_TEXT_FIELD,
+    RERANK_MAX_LENGTH,
+)
+from app.cache.rerank_score_cache import RerankScoreCache
+from app.utils.batching import MicroBatcher
+from app.utils.executor import run_blocking
 from app.utils.logger import logger
 import torch
 import time
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
+
+def rerank_depth(k: int) -> int:
+    """Hits to retrieve when reranking: the cascade needs a pool beyond k to prune."""
+    return max(k, CANDIDATE_LIMIT)
+
+
 class RerankerProcessor:
     """
     Efficient multilingual reranker using FlagEmbedding.
-    Model: BAAI/bge-reranker-v2-m3
+    Model: RERANKER_MODEL (default BAAI/bge-reranker-v2-m3)
+
+    Use get_reranker() instead of constructing this directly so the
+    model is loaded once per process.
     """
 
-    def __init__(self):
-        logger.info("[Reranker] Loading FlagEmbedding model: BAAI/bge-reranker-v2-m3")
+    def __init__(self, model_name: str = RERANKER_MODEL):
+        self.model_name = model_name
+        self.ready = False
+
+        logger.info(f"[Reranker] Loading FlagEmbedding model: {model_name}")
         logger.info(f"[Reranker] Device selected: {device.upper()}")
 
         self.model = FlagReranker(
-            "BAAI/bge-reranker-v2-m3",
+            model_name,
             use_fp16=True,
             device=device
         )
 
         logger.info("[Reranker] Model loaded successfully")
 
-    def rerank(self, query, docs):
-        logger.debug(f"[Reranker] Starting rerank for {len(docs)} documents")
+        # Pairs from concurrent searches share one forward pass
+        self.batcher = MicroBatcher(
+            "reranker", self.score_batch, RERANK_BATCH_MAX_PAIRS, RERANK_BATCH_WAIT_MS
+        ) if INFERENCE_BATCHING else None
+
+        self.cache = RerankScoreCache(model_name) if RERANK_SCORE_CACHE else None
+        self._warned_text = False
+
+    def score_batch(self, pairs):
+        # compute_score returns a bare float for a single pair
+        scores = self.model.compute_score(pairs, max_length=RERANK_MAX_LENGTH)
+        return [float(s) for s in np.atleast_1d(scores)]
+
+    async def score(self, pairs):
+        if not pairs:
+            return []
+        if self.batcher is not None:
+            return await asyncio.wrap_future(self.batcher.submit(pairs))
+        return await run_blocking(self.score_batch, pairs)
+
+    def warmup(self):
+        """One tiny forward pass so the first real request is not the slow one."""
+        start = time.perf_counter()
+        self.score_batch([["warmup", "warmup"]])
+        elapsed = time.perf_counter() - start
+
+        self.ready = True
+        logger.info(f"[Reranker] Warm-up done in {elapsed:.4f} sec")
+
+    async def cached_score(self, query, docs, pairs):
+        """score(), running the model only on pairs missing from the score cache."""
+        if self.cache is None:
+            return await self.score(pairs)
+
+        keys = [self.cache.key(query, d.get("_id"), text) for d, (_, text) in zip(docs, pairs)]
+        scores = self.cache.get_many(keys)
+        missing = [i for i, s in enumerate(scores) if s is None]
+
+        if missing:
+            fresh = await self.score([pairs[i] for i in missing])
+            for i, s in zip(missing, fresh):
+                scores[i] = s
+            self.cache.set_many([keys[i] for i in missing], fresh)
+
+        logger.debug(f"[Reranker] Score cache: {len(pairs) - len(missing)} hit, {len(missing)} scored")
+        return scores
 
-        pairs = []
-        for d in docs:
+    async def rerank(self, query, docs, top_k=None):
+        """
+        Cascade rerank: the best CANDIDATE_LIMIT docs by retrieval score are
+        scored in chunks of RERANK_CHUNK_SIZE, best first. Scoring stops
+        once the k-th best rerank score beats everything in the latest
+        chunk by RERANK_EARLY_STOP_MARGIN. Docs never scored keep their
+        retrieval order after the reranked ones.
+        """
+        top_k = top_k or len(docs)
+        docs = sorted(docs, key=lambda x: x.get("_score") or 0.0, reverse=True)
+        candidates = docs[:CANDIDATE_LIMIT]
+
+        logger.debug(
+            f"[Reranker] Starting rerank for {len(candidates)}/{len(docs)} documents"
+        )
+
+        # only RERANK_FIELDS are fetched at retrieval, so title_en is the
+        # one fallback; an index without the field should set RERANK_TEXT_FIELD
+        pairs, untexted = [], 0
+        for d in candidates:
             src = d.get("_source", {})
-            text = src.get("combined_text") \
-                or src.get("title_en") \
-                or ""
+            text = src.get(RERANK_TEXT_FIELD)
+            if not text:
+                untexted += 1
+                text = src.get("title_en") or ""
             pairs.append([query, text])
 
+        if untexted and not self._warned_text:
+            self._warned_text = True
+            logger.warning(
+                f"[Reranker] {untexted}/{len(candidates)} candidates have no {RERANK_TEXT_FIELD}; "
+                f"scoring title_en instead (rebuild the index or set RERANK_TEXT_FIELD)"
+            )
+
         logger.debug("[Reranker] Computing cross-encoder relevance scores...")
 
         start = time.perf_counter()
-        scores = self.model.compute_score(pairs)
+        scored = []
+        for lo in range(0, len(candidates), RERANK_CHUNK_SIZE):
+            chunk = candidates[lo:lo + RERANK_CHUNK_SIZE]
+            scores = await self.cached_score(query, chunk, pairs[lo:lo + RERANK_CHUNK_SIZE])
+            for d, s in zip(chunk, scores):
+                d["rerank_score"] = s
+            scored.extend(chunk)
+
+            if len(scored) < top_k or len(scored) == len(candidates):
+                continue
+            kth = sorted((d["rerank_score"] for d in scored), reverse=True)[top_k - 1]
+            if kth - max(scores) >= RERANK_EARLY_STOP_MARGIN:
+                logger.info(
+                    f"[Reranker] Early stop after {len(scored)}/{len(candidates)} candidates"
+                )
+                break
         elapsed = time.perf_counter() - start
 
         logger.info(f"[Reranker] Scoring duration: {elapsed:.4f} sec using {device.upper()}")
 
-        scores = [float(s) for s in scores]
+        scored.sort(key=lambda x: x["rerank_score"], reverse=True)
+        rest = docs[len(scored):]
+
+        logger.info(
+            f"[Reranker] Reranking completed → {len(scored)} docs scored, "
+            f"{len(rest)} kept in retrieval order"
+        )
+
+        return scored + rest
+
+
+# --------------------------------------------------
+# PROCESS-WIDE INSTANCE
+# --------------------------------------------------
+_reranker = None
+_lock = threading.Lock()
+
+
+def get_reranker() -> RerankerProcessor:
+    """Load (and warm up) the reranker on first use; later calls are free."""
+    global _reranker
+    if _reranker is not None:
+        return _reranker
+
+    with _lock:
+        if _reranker is None:
+            reranker = RerankerProcessor(RERANKER_MODEL)
+            reranker.warmup()
+            _reranker = reranker
+
+    return _reranker
+
+
+async def aget_reranker() -> RerankerProcessor:
+    """get_reranker() without blocking the event loop on the first load."""
+    if _reranker is not None:
+        return _reranker
+    return await run_blocking(get_reranker)
 
-        for d, s in zip(docs, scores):
-            d["rerank_score"] = s
 
-        docs.sort(key=lambda x: x.get("rerank_score", 0), reverse=True)
+def get_loaded_reranker():
+    """The reranker if it has been loaded, without triggering a load."""
+    return _reranker
 
-        logger.info(f"[Reranker] Reranking completed → {len(docs)} docs sorted")
 
-        return docs
+def reranker_status() -> dict:
+    return {
+        "model": RERANKER_MODEL,
+        "loaded": _reranker is not None,
+        "ready": _reranker is not None and _reranker.ready,
+    }
@@ -0,0 +1,193 @@
+import json
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.utils.logger import logger
+
+FILTER_FIELDS = ("store", "brand", "product_group")
+
+
+def fold(value: Optional[str]) -> Optional[str]:
+    """Filter value as the index's lowercase_normalizer sees it (lowercase + asciifolding)."""
+    value = (value or "").strip().lower()
+    value = "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+    return value or None
+
+
+def fold_vocab(values: List[str]) -> Dict[str, List[int]]:
+    """
+    Folded value → codes of the snapshot's raw values that fold to it.
+    The snapshot stores raw values, so folding lives only here.
+    """
+    out: Dict[str, List[int]] = {}
+    for code, value in enumerate(values):
+        folded = fold(value)
+        if folded is not None:
+            out.setdefault(folded, []).append(code)
+    return out
+
+
+class IVFIndex:
+    """
+    In-process kNN over the pre_deploy vector snapshot (python -m vector_snapshot).
+
+    Rows are grouped by IVF list, so a query computes distances to the
+    centroids, then scans the NPROBE closest lists as contiguous slices of
+    the memory-mapped vectors. SearchFilters are applied to those rows
+    before scoring; when too few rows match, further lists are probed in
+    centroid order until k candidates exist (like OpenSearch's efficient
+    filtering, a filtered query still returns k hits when they exist).
+
+    Scores use the lucene l2 convention, 1 / (1 + d²), so hits fuse the
+    same way OpenSearch kNN hits do. Hits carry the `source_fields` the
+    snapshot stored per row (rerank text + response fields), so they need
+    no mget; snapshots without sources.jsonl only carry id.
+    """
+
+    def __init__(self, path: Path, nprobe: int):
+        self.path = Path(path)
+        self.nprobe = nprobe
+
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.rows = meta["rows"]
+        self.dim = meta["dim"]
+        self.indices = meta["indices"]
+        self.projection = meta.get("projection")
+        self.created = meta.get("created")
+
+        self.vectors = np.memmap(
+            self.path / "vectors.f32", dtype=np.float32, mode="r", shape=(self.rows, self.dim)
+        )
+        self.norms = np.load(self.path / "norms.npy", mmap_mode="r")
+        self.centroids = np.load(self.path / "centroids.npy")
+        self.offsets = np.load(self.path / "offsets.npy")
+        self.index_codes = np.load(self.path / "index.npy", mmap_mode="r")
+        self.price = np.load(self.path / "price.npy", mmap_mode="r")
+        self.ids = json.loads((self.path / "ids.json").read_text())
+
+        self.source_fields = ["id"]
+        self.sources = None
+        if (self.path / "sources.jsonl").exists():
+            self.source_fields = meta["source_fields"]
+            self.sources = np.memmap(self.path / "sources.jsonl", dtype=np.uint8, mode="r")
+            self.source_offsets = np.load(self.path / "source_offsets.npy", mmap_mode="r")
+
+        self.codes = {f: np.load(self.path / f"{f}.npy", mmap_mode="r") for f in FILTER_FIELDS}
+        self.vocab = {f: fold_vocab(meta["vocab"][f]) for f in FILTER_FIELDS}
+
+    @classmethod
+    def load(cls, path: str, nprobe: int) -> Optional["IVFIndex"]:
+        path = Path(path)
+        if not (path / "meta.json").exists():
+            logger.error(f"[IVFIndex] Snapshot not found: {path}")
+            return None
+
+        index = cls(path, nprobe)
+        logger.info(
+            f"[IVFIndex] Loaded snapshot {path} ({index.rows} × {index.dim}, "
+            f"{len(index.centroids)} lists, nprobe={nprobe}, created {index.created})"
+        )
+        return index
+
+    # --------------------------------------------------
+    # SEARCH
+    # --------------------------------------------------
+    def search(self, emb: np.ndarray, k: int, filters=None) -> list:
+        """Top-k hits ({_index, _id, _score, _source: source_fields}) for a query vector."""
+        start = time.perf_counter()
+        q = np.asarray(emb, dtype=np.float32)
+
+        wanted = self._filter_codes(filters)
+        if wanted is None:
+            return []
+
+        probe_order = np.argsort(((self.centroids - q) ** 2).sum(axis=1))
+
+        rows, dists, found, probed = [], [], 0, 0
+        for lst in probe_order:
+            if probed >= self.nprobe and found >= k:
+                break
+            probed += 1
+
+            a, b = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            if a == b:
+                continue
+
+            # ||x - q||² = ||x||² - 2 x·q + ||q||²
+            if filters:
+                ids = a + np.flatnonzero(self._mask(a, b, filters, wanted))
+                if not len(ids):
+                    continue
+                d = self.norms[ids] - 2.0 * (self.vectors[ids] @ q)
+            else:
+                # unfiltered lists are contiguous slices of the memmap
+                ids = np.arange(a, b)
+                d = self.norms[a:b] - 2.0 * (self.vectors[a:b] @ q)
+
+            rows.append(ids)
+            dists.append(d)
+            found += len(ids)
+
+        if not rows:
+            return []
+
+        rows = np.concatenate(rows)
+        d2 = np.maximum(np.concatenate(dists) + float(q @ q), 0.0)
+        if len(rows) > k:
+            top = np.argpartition(d2, k - 1)[:k]
+            rows, d2 = rows[top], d2[top]
+        order = np.argsort(d2, kind="stable")
+
+        hits = [
+            {
+                "_index": self.indices[self.index_codes[r]],
+                "_id": self.ids[r],
+                "_score": float(1.0 / (1.0 + d)),
+                "_source": self.source(r),
+            }
+            for r, d in zip(rows[order].tolist(), d2[order].tolist())
+        ]
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"[IVFIndex] {len(hits)} hits from {probed} lists in {elapsed * 1000:.2f} ms")
+        return hits
+
+    def source(self, row: int) -> dict:
+        if self.sources is None:
+            return {"id": self.ids[row]}
+        a, b = int(self.source_offsets[row]), int(self.source_offsets[row + 1])
+        return json.loads(self.sources[a:b].tobytes())
+
+    # --------------------------------------------------
+    # FILTERS
+    # --------------------------------------------------
+    def _filter_codes(self, filters) -> Optional[dict]:
+        """Vocabulary codes per active term filter; None when a value never occurs."""
+        wanted = {}
+        for field in FILTER_FIELDS:
+            value = getattr(filters, field, None) if filters else None
+            if value is None:
+                continue
+            codes = self.vocab[field].get(fold(value))
+            if codes is None:
+                return None
+            wanted[field] = codes
+        return wanted
+
+    def _mask(self, a: int, b: int, filters, wanted: dict) -> np.ndarray:
+        mask = np.ones(b - a, dtype=bool)
+        for field, codes in wanted.items():
+            column = self.codes[field][a:b]
+            mask &= column == codes[0] if len(codes) == 1 else np.isin(column, codes)
+
+        # NaN (no price) never satisfies a bound, like a missing field in a range query
+        price = self.price[a:b]
+        if filters.price_min is not None:
+            mask &= price >= filters.price_min
+        if filters.price_max is not None:
+            mask &= price <= filters.price_max
+        return mask
@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app.utils.logger import logger
+
+
+class _Request:
+    __slots__ = ("items", "future")
+
+    def __init__(self, items):
+        self.items = items
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching for model inference.
+
+    Concurrent callers submit lists of items; a single worker thread
+    drains the queue and runs them through `fn` as ONE batched call once
+    `max_batch_size` items are queued or `max_wait_ms` has passed since
+    the first one arrived. Each caller gets a Future with its own slice
+    of the results.
+
+    `fn` must map a list of N items to N results.
+    """
+
+    def __init__(self, name: str, fn, max_batch_size: int, max_wait_ms: float):
+        self.name = name
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._loop, name=f"batcher-{name}", daemon=True
+        )
+        self._thread.start()
+
+        logger.info(
+            f"[Batcher:{name}] Started (max_batch={max_batch_size}, max_wait={max_wait_ms}ms)"
+        )
+
+    def submit(self, items) -> Future:
+        req = _Request(list(items))
+        self._queue.put(req)
+        return req.future
+
+    def _collect(self):
+        first = self._queue.get()
+        batch, size = [first], len(first.items)
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                req = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(req)
+            size += len(req.items)
+
+        return batch, size
+
+    def _loop(self):
+        while True:
+            batch, size = self._collect()
+            flat = [item for req in batch for item in req.items]
+
+            try:
+                start = time.perf_counter()
+                results = list(self.fn(flat))
+                elapsed = time.perf_counter() - start
+                logger.debug(
+                    f"[Batcher:{self.name}] {len(batch)} requests / {size} items "
+                    f"in {elapsed:.4f} sec"
+                )
+            except Exception as e:
+                for req in batch:
+                    req.future.set_exception(e)
+                continue
+
+            offset = 0
+            for req in batch:
+                n = len(req.items)
+                req.future.set_result(results[offset:offset + n])
+                offset += n
@@ -0,0 +1,14 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.config.settings import INFERENCE_WORKERS
+
+# Bounded pool for CPU-bound model work called from async handlers.
+# Torch releases the GIL during forward passes, so threads are enough.
+_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
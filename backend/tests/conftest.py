@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# `app` is imported from the backend root, as uvicorn does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,19 @@
+from app.retrieval.ivf_index import fold, fold_vocab
+
+
+def test_fold_matches_lowercase_normalizer():
+    assert fold("  Apple ") == "apple"
+    assert fold("Café") == "cafe"
+    assert fold("   ") is None
+    assert fold(None) is None
+
+
+def test_raw_snapshot_values_fold_onto_shared_codes():
+    # vocab as vector_snapshot writes it: raw values in code order
+    raw = ["Apple", "apple ", "Café", "cafe", " ", "Noon"]
+
+    assert fold_vocab(raw) == {"apple": [0, 1], "cafe": [2, 3], "noon": [5]}
+
+
+def test_folded_vocab_of_older_snapshots_is_unchanged():
+    assert fold_vocab(["apple", "cafe"]) == {"apple": [0], "cafe": [1]}
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.config.settings import CANDIDATE_LIMIT, RERANK_CHUNK_SIZE, RERANK_TEXT_FIELD
+from app.ranking import reranker_processor as rp
+
+
+class FakeReranker(rp.RerankerProcessor):
+    """RerankerProcessor without the model: scores come from a per-text table."""
+
+    def __init__(self, scores):
+        self.model_name = "fake"
+        self.ready = True
+        self.batcher = None
+        self.cache = None
+        self._warned_text = False
+        self.table = scores
+        self.scored = []
+
+    def score_batch(self, pairs):
+        self.scored.extend(text for _, text in pairs)
+        return [self.table[text] for _, text in pairs]
+
+
+def pool(n):
+    """n hits in retrieval order, as the pipeline retrieves them for reranking."""
+    return [
+        {"_id": str(i), "_score": float(n - i), "_source": {RERANK_TEXT_FIELD: f"doc{i}"}}
+        for i in range(n)
+    ]
+
+
+def rerank(reranker, hits, k):
+    return asyncio.run(reranker.rerank("query", hits, k))
+
+
+def test_pool_is_deeper_than_k():
+    assert rp.rerank_depth(10) == CANDIDATE_LIMIT
+    assert rp.rerank_depth(CANDIDATE_LIMIT + 5) == CANDIDATE_LIMIT + 5
+
+
+def test_early_stop_skips_the_rest_of_the_pool():
+    k = 10
+    n = rp.rerank_depth(k)
+    assert n >= 2 * RERANK_CHUNK_SIZE
+
+    # the first chunk holds the relevant docs, everything after is far below:
+    # chunk 1 cannot stop (it contains the top score itself), chunk 2 falls
+    # short of the k-th score by more than the margin, so scoring stops there
+    scores = {f"doc{i}": (8.0 if i < RERANK_CHUNK_SIZE else -8.0) for i in range(n)}
+    scores["doc0"] = 9.0
+    reranker = FakeReranker(scores)
+
+    out = rerank(reranker, pool(n), k)
+
+    assert len(reranker.scored) == 2 * RERANK_CHUNK_SIZE < n
+    assert out[0]["_id"] == "0"
+    assert all("rerank_score" in h for h in out[:k])
+    assert len(out) == n
+
+
+def test_close_scores_run_the_whole_pool():
+    k = 10
+    n = rp.rerank_depth(k)
+    reranker = FakeReranker({f"doc{i}": 0.0 for i in range(n)})
+
+    out = rerank(reranker, pool(n), k)
+
+    assert len(reranker.scored) == n
+    assert all("rerank_score" in h for h in out)
+
+
+def test_late_relevant_doc_is_promoted():
+    k = 5
+    n = rp.rerank_depth(k)
+    scores = {f"doc{i}": 0.0 for i in range(n)}
+    scores[f"doc{n - 1}"] = 5.0             # retrieval ranked it last
+    reranker = FakeReranker(scores)
+
+    out = rerank(reranker, pool(n), k)
+
+    assert out[0]["_id"] == str(n - 1)
+
+
+@pytest.mark.parametrize("k", [1, 10])
+def test_rerank_keeps_every_hit(k):
+    n = rp.rerank_depth(k)
+    reranker = FakeReranker({f"doc{i}": float(i % 3) for i in range(n)})
+
+    out = rerank(reranker, pool(n), k)
+
+    assert sorted(h["_id"] for h in out) == sorted(str(i) for i in range(n))
@@ -0,0 +1,10 @@
+import pytest
+
+from app.processors import search_processor as sp
+
+
+def test_unknown_default_fusion_fails_at_startup(monkeypatch):
+    monkeypatch.setattr(sp, "HYBRID_FUSION", "rff")
+
+    with pytest.raises(ValueError, match="HYBRID_FUSION=rff"):
+        sp.SearchProcessor(client=None, index="products", model_name="unused")
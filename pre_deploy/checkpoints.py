@@ -0,0 +1,149 @@
+"""
+Ingest checkpoints for resumable runs.
+
+For every source file the checkpoint stores the byte offset (and line
+number) up to which every document has been acknowledged by bulk, plus
+the acknowledged / failed counts. A rerun seeks straight to that offset.
+
+Documents are acknowledged out of order (parallel bulk), so each file
+keeps a queue of dispatched lines; the committed offset only advances
+over a contiguous prefix of acknowledged lines. It never moves past a
+line bulk rejected, so a resumed run sends that line (and everything
+after it) again.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# (source file, line number, byte offset just past that line)
+Ref = Tuple[str, int, int]
+
+
+class _FileProgress:
+
+    def __init__(self, state: Dict[str, Any]):
+        self.state = state
+        self.pending = deque()      # (line, offset_after) in dispatch order
+        self.acked = set()          # acknowledged lines still in `pending`
+        self.failed = set()         # rejected lines still in `pending`
+        self.stalled = False        # a rejected line was reached: offset stays before it
+        self.read_all = False
+
+    def advance(self):
+        while self.pending and self.pending[0][0] in self.acked:
+            line, offset = self.pending.popleft()
+            self.acked.discard(line)
+            if line in self.failed:
+                self.failed.discard(line)
+                self.stalled = True
+            if not self.stalled:
+                self.state["line"] = line
+                self.state["offset"] = offset
+
+        if self.read_all and not self.pending and not self.stalled:
+            self.state["done"] = True
+
+
+class IngestCheckpoint:
+
+    def __init__(self, path: Path, run: Dict[str, Any], files: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.run = run
+        self.files = files or {}
+        self._progress: Dict[str, _FileProgress] = {}
+        self._saved_at = time.monotonic()
+
+    # --------------------------------------------------
+    # LOAD / SAVE
+    # --------------------------------------------------
+    @classmethod
+    def load(cls, path: Path) -> Optional["IngestCheckpoint"]:
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(path, data.get("run", {}), data.get("files", {}))
+
+    def matches(self, **run) -> bool:
+        return all(self.run.get(k) == v for k, v in run.items())
+
+    def due(self, interval: float) -> bool:
+        return time.monotonic() - self._saved_at >= interval
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"run": self.run, "files": self.files}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+        self._saved_at = time.monotonic()
+
+    def delete(self):
+        self.path.unlink(missing_ok=True)
+
+    # --------------------------------------------------
+    # READER SIDE
+    # --------------------------------------------------
+    def resume_point(self, source: str) -> Tuple[int, int, bool]:
+        """(byte offset, line number, done) to continue `source` from."""
+        st = self.files.get(source)
+        if not st:
+            return 0, 0, False
+        return st["offset"], st["line"], st["done"]
+
+    def dispatched(self, ref: Ref):
+        source, line, offset = ref
+        self._file(source).pending.append((line, offset))
+
+    def file_read(self, source: str):
+        """The reader reached EOF of `source`."""
+        p = self._file(source)
+        p.read_all = True
+        p.advance()
+
+    # --------------------------------------------------
+    # BULK SIDE
+    # --------------------------------------------------
+    def acked(self, refs: Iterable[Ref], failed: Iterable[Ref] = ()):
+        """
+        Mark documents as processed. Failed ones are counted, and the
+        committed offset of their file stops just before the first of them.
+        """
+        failed = set(failed)
+        touched = set()
+
+        for ref in refs:
+            source, line, _ = ref
+            p = self._file(source)
+            p.acked.add(line)
+            if ref in failed:
+                p.failed.add(line)
+            p.state["failed" if ref in failed else "acked"] += 1
+            touched.add(source)
+
+        for source in touched:
+            self._progress[source].advance()
+
+    def skipped(self, ref: Ref):
+        """A dispatched line produced no bulk action (e.g. duplicate)."""
+        source, line, _ = ref
+        p = self._file(source)
+        p.acked.add(line)
+        p.advance()
+
+    def total_acked(self) -> int:
+        return sum(st["acked"] for st in self.files.values())
+
+    def _file(self, source: str) -> _FileProgress:
+        p = self._progress.get(source)
+        if p is None:
+            st = self.files.setdefault(
+                source, {"offset": 0, "line": 0, "acked": 0, "failed": 0, "done": False}
+            )
+            p = self._progress[source] = _FileProgress(st)
+        return p
@@ -0,0 +1,358 @@
+"""
+INCREMENTAL DELTA INGEST
+Keeps OPENSEARCH_INDEX in sync with the JSONL files under DATA_ROOT
+without a full rebuild:
+
+    appended lines → parsed from the last committed offset, upserted
+    rewritten file → re-parsed, changed products upserted, vanished ones deleted
+    removed file   → all of its products deleted
+
+Usage:
+    python -m delta_ingest              one pass
+    python -m delta_ingest --watch      poll forever (DELTA_POLL_SECONDS)
+    python -m delta_ingest --baseline   record the current files as already indexed
+                                        (run once right after a full `make seed`)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from opensearch_client import (
+    BASE_DIR,
+    DATA_ROOT,
+    INDEX_PER_STORE,
+    OPENSEARCH_INDEX,
+    VERSION_RE,
+    BulkUploader,
+    EmbedStage,
+    StageStats,
+    alias_targets,
+    embed_actions,
+    fallback_id,
+    index_body_for,
+    iter_batches,
+    iter_jsonl,
+    load_embedder,
+    load_projection,
+    load_quantizer,
+    log_error,
+    log_info,
+    log_success,
+    log_warn,
+    make_client,
+    make_dedupe_key,
+    normalize_doc,
+    normalize_raw,
+    store_alias,
+    store_aliases,
+    store_key,
+)
+
+# ---------------------------------------------------
+# CONFIG
+# ---------------------------------------------------
+DELTA_STATE_PATH = Path(os.getenv("DELTA_STATE_PATH", BASE_DIR / ".delta_state.sqlite"))
+DELTA_POLL_SECONDS = float(os.getenv("DELTA_POLL_SECONDS", 5))
+DELTA_BULK_DOCS = int(os.getenv("DELTA_BULK_DOCS", 50))
+
+# bytes hashed at the start of a file and just before the committed offset
+FINGERPRINT_BYTES = 4096
+
+
+# ---------------------------------------------------
+# STATE
+# ---------------------------------------------------
+class DeltaState:
+    """What has already been pushed, per source file and per product."""
+
+    def __init__(self, path: Path = DELTA_STATE_PATH):
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER, mtime REAL,
+                offset INTEGER, fingerprint TEXT
+            );
+            CREATE TABLE IF NOT EXISTS products (
+                id TEXT PRIMARY KEY, path TEXT, hash TEXT
+            );
+            CREATE INDEX IF NOT EXISTS products_path ON products (path);
+        """)
+
+    def file(self, source: str) -> Optional[Tuple[int, float, int, str]]:
+        return self.db.execute(
+            "SELECT size, mtime, offset, fingerprint FROM files WHERE path = ?", (source,)
+        ).fetchone()
+
+    def paths(self) -> List[str]:
+        return [r[0] for r in self.db.execute("SELECT path FROM files")]
+
+    def product_ids(self, source: str) -> Set[str]:
+        return {r[0] for r in self.db.execute("SELECT id FROM products WHERE path = ?", (source,))}
+
+    def products(self, ids: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """id → (hash, source file) for the ids already pushed."""
+        ids = list(ids)
+        out = {}
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            marks = ",".join("?" * len(part))
+            for pid, h, source in self.db.execute(
+                f"SELECT id, hash, path FROM products WHERE id IN ({marks})", part
+            ):
+                out[pid] = (h, source)
+        return out
+
+    def commit_file(self, source: str, size: int, mtime: float, offset: int, fingerprint: str,
+                    upserted: Dict[str, Optional[str]], deleted: Iterable[str]):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO products (id, path, hash) VALUES (?, ?, ?)",
+                [(pid, source, h) for pid, h in upserted.items()],
+            )
+            self.db.executemany(
+                "DELETE FROM products WHERE id = ? AND path = ?",
+                [(pid, source) for pid in deleted],
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime, offset, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, size, mtime, offset, fingerprint),
+            )
+
+    def drop_file(self, source: str):
+        with self.db:
+            self.db.execute("DELETE FROM products WHERE path = ?", (source,))
+            self.db.execute("DELETE FROM files WHERE path = ?", (source,))
+
+
+# ---------------------------------------------------
+# HELPERS
+# ---------------------------------------------------
+def fingerprint(path: Path, offset: int) -> str:
+    """Hash of the file head and of the bytes right before `offset`."""
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        h.update(f.read(min(FINGERPRINT_BYTES, offset)))
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        h.update(f.read(min(FINGERPRINT_BYTES, offset)))
+    return h.hexdigest()
+
+
+def line_hash(raw: Dict[str, Any]) -> str:
+    data = json.dumps(raw, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def read_changes(path: Path, start: int) -> Tuple[int, Dict[str, Tuple[str, Dict[str, Any]]]]:
+    """
+    Parse complete lines from `start`. Returns the new offset and the
+    latest (hash, doc) per product id — later lines win.
+    """
+    offset = start
+    latest = {}
+    for _, offset, raw in iter_jsonl(path, start, complete_only=True):
+        doc = normalize_doc(normalize_raw(raw, path.parent.name))
+        if not doc.get("id") and make_dedupe_key(doc) is None:
+            log_warn(f"Skipping untrackable product (no id/url/text) in {path}")
+            continue
+        doc["id"] = doc.get("id") or fallback_id(doc)
+        latest[doc["id"]] = (line_hash(raw), doc)
+    return offset, latest
+
+
+# ---------------------------------------------------
+# SYNC
+# ---------------------------------------------------
+class DeltaIngest:
+
+    def __init__(self, state: DeltaState, client=None, embed: Optional[EmbedStage] = None):
+        self.state = state
+        self.client = client
+        self.embed = embed
+        # INDEX_PER_STORE: per-store aliases known to exist
+        self._store_aliases = set(store_aliases(client)) if client is not None and INDEX_PER_STORE else set()
+
+    def sync(self, baseline: bool = False) -> Tuple[int, int]:
+        """One pass over DATA_ROOT. Returns (upserted, deleted)."""
+        upserted = deleted = 0
+        current = set()
+
+        for path in sorted(DATA_ROOT.rglob("*.jsonl")):
+            current.add(str(path))
+            u, d = self.sync_file(path, baseline)
+            upserted += u
+            deleted += d
+
+        for source in self.state.paths():
+            if source in current:
+                continue
+            gone = self.state.product_ids(source)
+            log_info(f"File removed: {source} → deleting {len(gone)} products")
+            failed = self._upload([], gone) if not baseline else set()
+            if failed:
+                # keep the file and its undeleted products so the next pass retries them
+                log_warn(f"{len(failed)} deletes failed for {source}; retrying next pass")
+                self.state.commit_file(source, *self.state.file(source), {}, gone - failed)
+            else:
+                self.state.drop_file(source)
+            deleted += len(gone - failed)
+
+        return upserted, deleted
+
+    def sync_file(self, path: Path, baseline: bool = False) -> Tuple[int, int]:
+        source = str(path)
+        st = path.stat()
+        prev = self.state.file(source)
+
+        if prev and prev[0] == st.st_size and prev[1] == st.st_mtime:
+            return 0, 0
+
+        # appended: the file grew and everything up to the old offset is untouched
+        appended = (
+            prev is not None
+            and st.st_size > prev[0]
+            and fingerprint(path, prev[2]) == prev[3]
+        )
+        start = prev[2] if appended else 0
+        offset, latest = read_changes(path, start)
+
+        # a product that moved to this file is re-pushed so its owner is updated
+        known = self.state.products(latest.keys())
+        changed = [doc for pid, (h, doc) in latest.items() if known.get(pid) != (h, source)]
+        gone = set() if appended else self.state.product_ids(source) - latest.keys()
+
+        failed = set()
+        if not baseline and (changed or gone):
+            log_info(
+                f"{'Appended' if appended else 'Changed'}: {path} → "
+                f"upsert={len(changed)} delete={len(gone)}"
+            )
+            failed = self._upload(changed, gone)
+
+        # failed upserts keep no hash and failed deletes stay in state; the
+        # file record does not advance (a new file records nothing read yet),
+        # so the next pass re-reads the same lines and pushes what failed again
+        committed = {
+            doc["id"]: (None if doc["id"] in failed else latest[doc["id"]][0])
+            for doc in changed
+        }
+        record = (st.st_size, st.st_mtime, offset, fingerprint(path, offset))
+        if failed:
+            log_warn(f"{len(failed)} upserts/deletes failed for {path}; retrying next pass")
+            record = prev or (-1, 0.0, 0, fingerprint(path, 0))
+        self.state.commit_file(source, *record, committed, gone - failed)
+        return len(changed) - len(failed & committed.keys()), len(gone - failed)
+
+    def _upload(self, docs: List[Dict[str, Any]], deletes: Iterable[str]) -> Set[str]:
+        """Upsert + delete through small bulk chunks; returns failed ids."""
+        failed = set()
+
+        def on_chunk(chunk, failures):
+            failed.update(f["_id"] for f in failures)
+
+        def actions():
+            for pid in deletes:
+                for index in self._delete_targets():
+                    yield {"_op_type": "delete", "_index": index, "_id": pid}
+            for batch in iter_batches(docs, DELTA_BULK_DOCS):
+                yield from embed_actions(self.embed, batch, self._route)
+
+        uploader = BulkUploader(
+            self.client, self.embed.stats, on_chunk,
+            append_failures=True, chunk_docs=DELTA_BULK_DOCS,
+        )
+        uploader.run(actions())
+        return failed
+
+    def _route(self, doc: Dict[str, Any]) -> str:
+        """Write target: the shared alias, or the store's alias with INDEX_PER_STORE."""
+        if not INDEX_PER_STORE:
+            return OPENSEARCH_INDEX
+
+        alias = store_alias(store_key(doc.get("store")))
+        if alias not in self._store_aliases:
+            self._add_store_index(alias)
+        return alias
+
+    def _delete_targets(self) -> List[str]:
+        # products only remember their file, not their store; a delete goes
+        # to every store and the stores without the product answer 404,
+        # which the uploader does not count as a failure
+        if not INDEX_PER_STORE:
+            return [OPENSEARCH_INDEX]
+        return sorted(self._store_aliases)
+
+    def _add_store_index(self, alias: str):
+        """A store the last full build did not have: give it an index at the live version."""
+        live = [
+            int(m.group(2)) for m in map(VERSION_RE.match, alias_targets(self.client, OPENSEARCH_INDEX))
+            if m
+        ]
+        index = f"{alias}_v{max(live) if live else 1}"
+
+        log_warn(f"New store → creating {index}")
+        if not self.client.indices.exists(index):
+            self.client.indices.create(index=index, body=index_body_for(self.embed))
+        self.client.indices.update_aliases(body={"actions": [
+            {"add": {"index": index, "alias": OPENSEARCH_INDEX}},
+            {"add": {"index": index, "alias": alias}},
+        ]})
+        self._store_aliases.add(alias)
+
+
+# ---------------------------------------------------
+# MAIN
+# ---------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Incremental JSONL → OpenSearch sync")
+    parser.add_argument("--watch", action="store_true", help="poll DATA_ROOT forever")
+    parser.add_argument("--baseline", action="store_true",
+                        help="record current files as indexed, upload nothing")
+    args = parser.parse_args()
+
+    state = DeltaState()
+
+    if args.baseline:
+        upserted, _ = DeltaIngest(state).sync(baseline=True)
+        log_success(f"Baseline recorded: {upserted} products")
+        return
+
+    client = make_client()
+    if not client.indices.exists(OPENSEARCH_INDEX):
+        log_error(f"{OPENSEARCH_INDEX} does not exist. Run a full `make seed` first.")
+        return
+
+    embedder, dim = load_embedder()
+    embed = EmbedStage(embedder, dim, StageStats())
+    # never refit here: the live index was built with the saved artifacts
+    embed.projection = load_projection(embed, refit=False)
+    embed.quantizer = load_quantizer(embed, refit=False)
+    delta = DeltaIngest(state, client, embed)
+
+    try:
+        while True:
+            start = time.perf_counter()
+            upserted, deleted = delta.sync()
+            if upserted or deleted:
+                log_success(
+                    f"Delta: upserted={upserted} deleted={deleted} "
+                    f"in {time.perf_counter() - start:.1f}s"
+                )
+            if not args.watch:
+                break
+            time.sleep(DELTA_POLL_SECONDS)
+    except KeyboardInterrupt:
+        log_info("Watcher stopped.")
+    finally:
+        embed.close()
+        embed.stats.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Persistent embedding cache for the indexer.
+
+Vectors are keyed by a hash of (model name, embedding input) so unchanged
+products are never re-encoded. Storage is append-only:
+
+    keys.bin     one 16-byte digest per row
+    vectors.f32  float32 rows (memory-mapped for reads)
+    meta.json    model name, dimension, committed row count
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+KEY_BYTES = 16
+KEY_DTYPE = f"S{KEY_BYTES}"
+
+# keys appended this run live in a small sorted index that is merged into
+# the main one once it exceeds max(RECENT_MERGE_ROWS, main / 8) rows
+RECENT_MERGE_ROWS = 65536
+
+
+class EmbeddingCache:
+
+    def __init__(self, path: Path, model_name: str, dim: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.model_name = model_name
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+
+        self._keys_path = self.path / "keys.bin"
+        self._vectors_path = self.path / "vectors.f32"
+        self._meta_path = self.path / "meta.json"
+
+        rows = self._load_meta()
+        self._truncate(rows)
+
+        keys = np.fromfile(self._keys_path, dtype=KEY_DTYPE) if rows else np.empty(0, KEY_DTYPE)
+        order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[order]
+        self._sorted_rows = order.astype(np.int64)
+        self._recent_keys = np.empty(0, KEY_DTYPE)
+        self._recent_rows = np.empty(0, np.int64)
+
+        self._rows = rows
+        # rows touched by this run; capacity grows geometrically, [:_rows] is valid
+        self._used = np.zeros(max(rows, 1024), dtype=bool)
+        self._mmap = None
+        self._mapped_rows = 0
+
+        self._keys_file = self._keys_path.open("ab")
+        self._vectors_file = self._vectors_path.open("ab")
+
+    # --------------------------------------------------
+    # PUBLIC API
+    # --------------------------------------------------
+    def key(self, text: str) -> bytes:
+        raw = f"{self.model_name}\0{text}".encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=KEY_BYTES).digest()
+
+    def lookup(self, texts: List[str]) -> Tuple[List[bytes], np.ndarray, List[int]]:
+        """
+        Returns (keys, vectors, missing) where vectors holds cached rows and
+        `missing` lists the positions that still have to be encoded.
+        """
+        keys = [self.key(t) for t in texts]
+        rows = self._find(np.array(keys, dtype=KEY_DTYPE))
+
+        vectors = np.zeros((len(keys), self.dim), dtype=np.float32)
+        hit = rows >= 0
+        if hit.any():
+            vectors[hit] = self._vectors()[rows[hit]]
+            self._used[rows[hit]] = True
+
+        missing = [i for i in range(len(keys)) if not hit[i]]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return keys, vectors, missing
+
+    def put(self, keys: List[bytes], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not len(keys):
+            return
+
+        # first occurrence of each key that is not cached yet, in input order
+        q = np.array(keys, dtype=KEY_DTYPE)
+        _, first = np.unique(q, return_index=True)
+        first = np.sort(first)
+        new = first[self._find(q[first]) < 0]
+        if not len(new):
+            return
+
+        self._keys_file.write(q[new].tobytes())
+        self._vectors_file.write(np.ascontiguousarray(vectors[new]).tobytes())
+
+        rows = np.arange(self._rows, self._rows + len(new), dtype=np.int64)
+        self._rows += len(new)
+        self._reserve(self._rows)
+        self._used[rows] = True
+        self._index_recent(q[new], rows)
+
+    def flush(self):
+        """Make every row appended so far survive a crash."""
+        self._keys_file.flush()
+        self._vectors_file.flush()
+        self._write_meta()
+
+    def close(self, compact: bool = False):
+        """
+        Persist the cache. With compact=True (only after a complete run)
+        rows that were not touched by this run are dropped.
+        """
+        self._keys_file.close()
+        self._vectors_file.close()
+        self._mmap = None
+
+        if compact and not self._used[:self._rows].all():
+            self._compact()
+
+        self._write_meta()
+
+    # --------------------------------------------------
+    # INTERNALS
+    # --------------------------------------------------
+    def _load_meta(self) -> int:
+        if not self._meta_path.exists():
+            self._reset()
+            return 0
+
+        meta = json.loads(self._meta_path.read_text())
+        if meta.get("model") != self.model_name or meta.get("dim") != self.dim:
+            self._reset()
+            return 0
+
+        # rows appended after the last clean close are not trusted
+        return int(meta.get("rows", 0))
+
+    def _write_meta(self):
+        self._meta_path.write_text(json.dumps({
+            "model": self.model_name,
+            "dim": self.dim,
+            "rows": self._rows,
+        }))
+
+    def _reset(self):
+        for p in (self._keys_path, self._vectors_path, self._meta_path):
+            p.unlink(missing_ok=True)
+        self._keys_path.touch()
+        self._vectors_path.touch()
+
+    def _find(self, q: np.ndarray) -> np.ndarray:
+        """Row of every key in `q`, -1 where it is not cached."""
+        rows = np.full(len(q), -1, dtype=np.int64)
+        for keys, key_rows in (
+            (self._sorted_keys, self._sorted_rows),
+            (self._recent_keys, self._recent_rows),
+        ):
+            if not len(keys):
+                continue
+            pos = np.minimum(np.searchsorted(keys, q), len(keys) - 1)
+            found = (keys[pos] == q) & (rows < 0)
+            rows[found] = key_rows[pos[found]]
+        return rows
+
+    def _index_recent(self, keys: np.ndarray, rows: np.ndarray):
+        keys = np.concatenate([self._recent_keys, keys])
+        rows = np.concatenate([self._recent_rows, rows])
+        order = np.argsort(keys, kind="stable")
+        self._recent_keys, self._recent_rows = keys[order], rows[order]
+
+        # geometric threshold: each key is merged O(log n) times over a run
+        if len(self._recent_keys) > max(RECENT_MERGE_ROWS, len(self._sorted_keys) // 8):
+            keys = np.concatenate([self._sorted_keys, self._recent_keys])
+            rows = np.concatenate([self._sorted_rows, self._recent_rows])
+            order = np.argsort(keys, kind="stable")
+            self._sorted_keys, self._sorted_rows = keys[order], rows[order]
+            self._recent_keys = np.empty(0, KEY_DTYPE)
+            self._recent_rows = np.empty(0, np.int64)
+
+    def _reserve(self, rows: int):
+        if rows > len(self._used):
+            grown = np.zeros(max(rows, 2 * len(self._used)), dtype=bool)
+            grown[:len(self._used)] = self._used
+            self._used = grown
+
+    def _truncate(self, rows: int):
+        with self._keys_path.open("r+b") as f:
+            f.truncate(rows * KEY_BYTES)
+        with self._vectors_path.open("r+b") as f:
+            f.truncate(rows * self.dim * 4)
+
+    def _vectors(self) -> np.ndarray:
+        if self._mmap is None or self._mapped_rows < self._rows:
+            self._vectors_file.flush()
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r",
+                shape=(self._rows, self.dim),
+            )
+            self._mapped_rows = self._rows
+        return self._mmap
+
+    def _compact(self):
+        keep = np.flatnonzero(self._used[:self._rows])
+        keys = np.fromfile(self._keys_path, dtype=KEY_DTYPE)
+        vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim)
+        )
+
+        tmp_keys = self._keys_path.with_suffix(".tmp")
+        tmp_vectors = self._vectors_path.with_suffix(".tmp")
+        with tmp_keys.open("wb") as kf, tmp_vectors.open("wb") as vf:
+            for start in range(0, len(keep), 10_000):
+                rows = keep[start:start + 10_000]
+                kf.write(keys[rows].tobytes())
+                vf.write(np.ascontiguousarray(vectors[rows]).tobytes())
+        del vectors
+
+        tmp_keys.replace(self._keys_path)
+        tmp_vectors.replace(self._vectors_path)
+        self._rows = len(keep)
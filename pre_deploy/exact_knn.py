@@ -0,0 +1,89 @@
+"""
+Exact (brute-force) k nearest neighbours in NumPy.
+
+Ground truth for ANN recall: every query is compared with every corpus
+row. Queries are processed in batches and the corpus in row chunks, so a
+memory-mapped corpus never has to be fully resident and peak memory is
+about batch × chunk distances.
+
+Space types follow the OpenSearch k-NN names:
+
+    l2           smallest ||q - x||²
+    cosinesimil  largest cos(q, x)
+    innerproduct largest q · x
+"""
+
+from typing import Optional
+
+import numpy as np
+
+SPACE_TYPES = ("l2", "cosinesimil", "innerproduct")
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def distances(queries: np.ndarray, corpus: np.ndarray, space: str) -> np.ndarray:
+    """(queries × corpus) matrix where smaller always means closer."""
+    if space == "l2":
+        # ||q||² is the same for a whole row, so it does not change the ranking
+        return (corpus * corpus).sum(axis=1)[None, :] - 2.0 * (queries @ corpus.T)
+    if space == "cosinesimil":
+        return -(_unit(queries) @ _unit(corpus).T)
+    if space == "innerproduct":
+        return -(queries @ corpus.T)
+    raise ValueError(f"Unknown space type: {space}")
+
+
+def exact_topk(corpus: np.ndarray, queries: np.ndarray, k: int, space: str = "l2",
+               exclude: Optional[np.ndarray] = None,
+               batch: int = 256, chunk: int = 65536) -> np.ndarray:
+    """
+    Row numbers of the exact top-k corpus rows for every query, closest first.
+    `exclude[i]` (optional) is a corpus row query i must not match, e.g.
+    the query's own row when queries are sampled from the corpus.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, len(corpus) - (exclude is not None))
+    out = np.empty((len(queries), k), dtype=np.int64)
+
+    for qs in range(0, len(queries), batch):
+        qb = queries[qs:qs + batch]
+        rows = np.arange(len(qb))
+        best_d = np.empty((len(qb), 0), dtype=np.float32)
+        best_i = np.empty((len(qb), 0), dtype=np.int64)
+
+        for cs in range(0, len(corpus), chunk):
+            xb = np.asarray(corpus[cs:cs + chunk], dtype=np.float32)
+            d = distances(qb, xb, space)
+
+            if exclude is not None:
+                local = exclude[qs:qs + batch] - cs
+                inside = (local >= 0) & (local < len(xb))
+                d[rows[inside], local[inside]] = np.inf
+
+            # merge this chunk with the running best k
+            cand_d = np.concatenate([best_d, d], axis=1)
+            cand_i = np.concatenate(
+                [best_i, np.broadcast_to(np.arange(cs, cs + len(xb)), d.shape)], axis=1
+            )
+            if cand_d.shape[1] > k:
+                keep = np.argpartition(cand_d, k - 1, axis=1)[:, :k]
+                cand_d = np.take_along_axis(cand_d, keep, axis=1)
+                cand_i = np.take_along_axis(cand_i, keep, axis=1)
+            best_d, best_i = cand_d, cand_i
+
+        order = np.argsort(best_d, axis=1, kind="stable")
+        out[qs:qs + len(qb)] = np.take_along_axis(best_i, order, axis=1)
+
+    return out
+
+
+def recall_at_k(truth: np.ndarray, found, k: int) -> float:
+    """Mean fraction of the exact top-k that appears in the first k results."""
+    if len(truth) == 0:
+        return 0.0
+    hits = sum(len(set(t[:k]) & set(f[:k])) for t, f in zip(truth.tolist(), found))
+    return hits / (len(truth) * min(k, truth.shape[1]))
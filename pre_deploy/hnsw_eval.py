@@ -0,0 +1,383 @@
+"""
+HNSW PARAMETER EVALUATION
+Measures recall@k against latency for k-NN index settings, using exact
+brute-force neighbours of the live catalog vectors as ground truth.
+
+    export  live index vectors → EVAL_DIR (vectors.f32 memmap + queries)
+    truth   exact top-k per query and space type, NumPy only (no cluster needed)
+    sweep   build a throwaway index per (m, ef_construction, space_type) from the
+            exported vectors, query it at every ef_search, report
+            recall@k with p50 / p95 latency
+
+Usage:
+    python -m hnsw_eval export [--queries queries.txt]
+    python -m hnsw_eval truth  [--space l2,cosinesimil] [-k 10]
+    python -m hnsw_eval sweep  [--m 16,32] [--ef-construction 128,256]
+                               [--ef-search 32,64,128,256,512] [--space l2] [-k 10]
+
+Queries are EVAL_QUERIES vectors sampled from the catalog (their own row
+is excluded from both sides), or the lines of --queries encoded like the
+backend does. With the lucene engine there is no ef_search setting: the
+size of the candidate queue is the query's k, so ef_search is sent as
+k = max(ef_search, k) and the top k hits are scored.
+"""
+
+import os
+import json
+import time
+import argparse
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from opensearchpy import helpers
+
+from exact_knn import SPACE_TYPES, exact_topk, recall_at_k
+from opensearch_client import (
+    BASE_DIR,
+    BULK_FORCE_MERGE_SEGMENTS,
+    OPENSEARCH_INDEX,
+    BulkUploader,
+    EmbedStage,
+    StageStats,
+    bulk_load_mode,
+    iter_batches,
+    load_embedder,
+    load_projection,
+    log_info,
+    log_success,
+    log_warn,
+    make_client,
+)
+
+# ---------------------------------------------------
+# CONFIG
+# ---------------------------------------------------
+# EVAL_DIR:          exported vectors, ground truth and sweep results
+# EVAL_QUERIES:      catalog vectors sampled as queries (without --queries)
+# EVAL_WARMUP:       untimed queries before each measured pass
+# EVAL_ENGINE:       k-NN engine of the sweep indexes (lucene | faiss | nmslib)
+# EVAL_TRUTH_BATCH:  queries per brute-force batch
+# EVAL_TRUTH_CHUNK:  corpus rows per brute-force chunk (bounds memory)
+EVAL_DIR = Path(os.getenv("EVAL_DIR", BASE_DIR / "eval"))
+EVAL_QUERIES = int(os.getenv("EVAL_QUERIES", 1000))
+EVAL_WARMUP = int(os.getenv("EVAL_WARMUP", 50))
+EVAL_ENGINE = os.getenv("EVAL_ENGINE", "lucene")
+EVAL_TRUTH_BATCH = int(os.getenv("EVAL_TRUTH_BATCH", 256))
+EVAL_TRUTH_CHUNK = int(os.getenv("EVAL_TRUTH_CHUNK", 65536))
+
+# throwaway index; outside the OPENSEARCH_INDEX_* namespace the loader manages
+EVAL_INDEX = f"hnsw_eval_{OPENSEARCH_INDEX}"
+SEED = 13
+
+
+# ---------------------------------------------------
+# EXPORT
+# ---------------------------------------------------
+def vectors_path() -> Path:
+    return EVAL_DIR / "vectors.f32"
+
+
+def load_export() -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+    """(memory-mapped corpus, queries, query rows or -1, meta) from EVAL_DIR."""
+    meta_path = EVAL_DIR / "meta.json"
+    if not meta_path.exists():
+        raise RuntimeError(f"No export in {EVAL_DIR}; run `python -m hnsw_eval export` first")
+
+    meta = json.loads(meta_path.read_text())
+    corpus = np.memmap(vectors_path(), dtype=np.float32, mode="r", shape=(meta["rows"], meta["dim"]))
+    queries = np.load(EVAL_DIR / "queries.npy")
+    query_rows = np.load(EVAL_DIR / "query_rows.npy")
+    return corpus, queries, query_rows, meta
+
+
+def export(queries_file: str = None):
+    """
+    Stream every stored vector of OPENSEARCH_INDEX into vectors.f32. The
+    full-precision embedding_fp32 is preferred when the index is quantized.
+    """
+    EVAL_DIR.mkdir(parents=True, exist_ok=True)
+    client = make_client()
+
+    rows, dim, field = 0, None, None
+    ids = []
+    tmp = vectors_path().with_suffix(".tmp")
+    start = time.perf_counter()
+
+    with tmp.open("wb") as f:
+        for hit in helpers.scan(
+            client, index=OPENSEARCH_INDEX, size=1000,
+            query={"_source": ["embedding", "embedding_fp32"]},
+        ):
+            src = hit["_source"]
+            vec = src.get("embedding_fp32") or src.get("embedding")
+            if not vec:
+                continue
+            if dim is None:
+                dim = len(vec)
+                field = "embedding_fp32" if "embedding_fp32" in src else "embedding"
+            f.write(np.asarray(vec, dtype=np.float32).tobytes())
+            ids.append(hit["_id"])
+            rows += 1
+
+    if not rows:
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(f"{OPENSEARCH_INDEX} has no vectors to export")
+    tmp.replace(vectors_path())
+    # ground truth of a previous export no longer applies
+    for old in EVAL_DIR.glob("truth_*.npy"):
+        old.unlink()
+
+    (EVAL_DIR / "ids.json").write_text(json.dumps(ids))
+    (EVAL_DIR / "meta.json").write_text(json.dumps({
+        "index": OPENSEARCH_INDEX, "field": field, "rows": rows, "dim": dim,
+    }))
+    log_success(f"Exported {rows} × {dim} vectors ({field}) in {time.perf_counter() - start:.1f}s")
+
+    corpus = np.memmap(vectors_path(), dtype=np.float32, mode="r", shape=(rows, dim))
+    if queries_file:
+        queries = encode_queries(Path(queries_file).read_text(encoding="utf-8").splitlines())
+        query_rows = np.full(len(queries), -1, dtype=np.int64)
+    else:
+        rng = np.random.default_rng(SEED)
+        query_rows = np.sort(rng.choice(rows, size=min(EVAL_QUERIES, rows), replace=False))
+        queries = np.asarray(corpus[query_rows])
+
+    if queries.shape[1] != dim:
+        raise RuntimeError(f"Query vectors have {queries.shape[1]} dims, index has {dim}")
+    np.save(EVAL_DIR / "queries.npy", queries.astype(np.float32))
+    np.save(EVAL_DIR / "query_rows.npy", query_rows)
+    log_info(f"Saved {len(queries)} queries")
+
+
+def encode_queries(texts: List[str]) -> np.ndarray:
+    """Real search queries, embedded the way the backend embeds them."""
+    texts = [t.strip() for t in texts if t.strip()]
+    embedder, dim = load_embedder()
+    embed = EmbedStage(embedder, dim, StageStats())
+    try:
+        embed.projection = load_projection(embed, refit=False)
+        return np.concatenate([
+            embed.index_vectors([f"query: {t}" for t in batch])
+            for batch in iter_batches(texts, embed.dispatch_size)
+        ])
+    finally:
+        embed.close()
+
+
+# ---------------------------------------------------
+# GROUND TRUTH (offline)
+# ---------------------------------------------------
+def truth_path(space: str, k: int) -> Path:
+    return EVAL_DIR / f"truth_{space}_k{k}.npy"
+
+
+def ground_truth(space: str, k: int) -> np.ndarray:
+    """Exact top-k rows per query for `space`, computed once and cached in EVAL_DIR."""
+    path = truth_path(space, k)
+    if path.exists():
+        return np.load(path)
+
+    corpus, queries, query_rows, _ = load_export()
+    start = time.perf_counter()
+    truth = exact_topk(
+        corpus, queries, k, space,
+        exclude=query_rows if (query_rows >= 0).all() else None,
+        batch=EVAL_TRUTH_BATCH, chunk=EVAL_TRUTH_CHUNK,
+    )
+    np.save(path, truth)
+    log_info(
+        f"Ground truth {space}@{k}: {len(queries)} queries × {len(corpus)} vectors "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return truth
+
+
+# ---------------------------------------------------
+# SWEEP
+# ---------------------------------------------------
+def eval_body(dim: int, m: int, ef_construction: int, space: str) -> Dict[str, Any]:
+    return {
+        "settings": {"index": {"knn": True}},
+        "mappings": {
+            "properties": {
+                "embedding": {
+                    "type": "knn_vector",
+                    "dimension": dim,
+                    "method": {
+                        "name": "hnsw",
+                        "space_type": space,
+                        "engine": EVAL_ENGINE,
+                        "parameters": {"m": m, "ef_construction": ef_construction},
+                    },
+                }
+            }
+        },
+    }
+
+
+def build_eval_index(client, corpus: np.ndarray, m: int, ef_construction: int, space: str,
+                     segments: int) -> float:
+    """(Re)create EVAL_INDEX from the exported vectors; returns build seconds."""
+    if client.indices.exists(EVAL_INDEX):
+        client.indices.delete(index=EVAL_INDEX)
+    client.indices.create(index=EVAL_INDEX, body=eval_body(corpus.shape[1], m, ef_construction, space))
+
+    def actions():
+        for start in range(0, len(corpus), 1000):
+            block = np.asarray(corpus[start:start + 1000])
+            for row, vec in enumerate(block, start):
+                yield {"_index": EVAL_INDEX, "_id": str(row), "_source": {"embedding": vec.tolist()}}
+
+    start = time.perf_counter()
+    with bulk_load_mode(client, EVAL_INDEX):
+        # own failures file: the loader's BULK_FAILURES_PATH must survive an eval run
+        uploader = BulkUploader(client, StageStats(), failures_path=EVAL_DIR / "bulk_failures.jsonl")
+        _, failed = uploader.run(actions())
+    if failed:
+        log_warn(f"{failed} vectors failed to index; recall is understated")
+    # bulk_load_mode already merged to BULK_FORCE_MERGE_SEGMENTS
+    if segments > 0 and segments != BULK_FORCE_MERGE_SEGMENTS:
+        client.indices.forcemerge(index=EVAL_INDEX, max_num_segments=segments, request_timeout=3600)
+    return time.perf_counter() - start
+
+
+def run_queries(client, queries: np.ndarray, query_rows: np.ndarray, k: int,
+                ef_search: int) -> Tuple[List[List[int]], np.ndarray, np.ndarray]:
+    """Returns (found rows per query, client latency ms, server `took` ms)."""
+    if EVAL_ENGINE == "lucene":
+        knn_k = max(ef_search, k + 1)
+    else:
+        client.indices.put_settings(index=EVAL_INDEX, body={"index": {"knn.algo_param.ef_search": ef_search}})
+        knn_k = k + 1
+
+    def search(vec):
+        # one extra hit: a query sampled from the corpus finds itself first
+        return client.search(index=EVAL_INDEX, body={
+            "size": k + 1, "_source": False,
+            "query": {"knn": {"embedding": {"vector": vec.tolist(), "k": knn_k}}},
+        })
+
+    for vec in queries[:EVAL_WARMUP]:
+        search(vec)
+
+    found, latency, took = [], [], []
+    for vec, own in zip(queries, query_rows):
+        start = time.perf_counter()
+        res = search(vec)
+        latency.append((time.perf_counter() - start) * 1000)
+        took.append(res["took"])
+        rows = [int(h["_id"]) for h in res["hits"]["hits"]]
+        found.append([r for r in rows if r != own][:k])
+
+    return found, np.array(latency), np.array(took)
+
+
+def sweep(ms: List[int], ef_constructions: List[int], ef_searches: List[int],
+          spaces: List[str], k: int, segments: int, keep: bool):
+    corpus, queries, query_rows, meta = load_export()
+    client = make_client()
+    results = []
+
+    log_info(
+        f"Sweeping {len(ms) * len(ef_constructions) * len(spaces)} index builds × "
+        f"{len(ef_searches)} ef_search on {meta['rows']} vectors ({EVAL_ENGINE}), "
+        f"{len(queries)} queries, recall@{k}"
+    )
+
+    try:
+        for space, m, ef_construction in product(spaces, ms, ef_constructions):
+            truth = ground_truth(space, k)
+            build = build_eval_index(client, corpus, m, ef_construction, space, segments)
+            log_info(f"Built m={m} ef_construction={ef_construction} space={space} in {build:.1f}s")
+
+            for ef_search in ef_searches:
+                found, latency, took = run_queries(client, queries, query_rows, k, ef_search)
+                p50, p95 = np.percentile(latency, [50, 95])
+                row = {
+                    "engine": EVAL_ENGINE, "space_type": space, "m": m,
+                    "ef_construction": ef_construction, "ef_search": ef_search, "k": k,
+                    "recall": round(recall_at_k(truth, found, k), 4),
+                    "p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2),
+                    "took_p50_ms": float(np.percentile(took, 50)),
+                    "build_s": round(build, 1),
+                }
+                results.append(row)
+                log_info(
+                    f"  ef_search={ef_search:<5} recall@{k}={row['recall']:.4f} "
+                    f"p50={row['p50_ms']:.1f}ms p95={row['p95_ms']:.1f}ms"
+                )
+    finally:
+        if not keep and client.indices.exists(EVAL_INDEX):
+            client.indices.delete(index=EVAL_INDEX)
+
+    out = EVAL_DIR / f"sweep_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.write_text(json.dumps(results, indent=2))
+    report(results, k)
+    log_success(f"Results written to {out}")
+
+
+def report(results: List[Dict[str, Any]], k: int):
+    header = f"{'space':<13}{'m':>4}{'ef_c':>6}{'ef_s':>6}{'recall@' + str(k):>11}{'p50 ms':>9}{'p95 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in sorted(results, key=lambda r: (r["space_type"], r["m"], r["ef_construction"], r["ef_search"])):
+        print(
+            f"{r['space_type']:<13}{r['m']:>4}{r['ef_construction']:>6}{r['ef_search']:>6}"
+            f"{r['recall']:>11.4f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+        )
+
+
+# ---------------------------------------------------
+# MAIN
+# ---------------------------------------------------
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def space_list(value: str) -> List[str]:
+    spaces = [v for v in value.split(",") if v]
+    unknown = set(spaces) - set(SPACE_TYPES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown space type(s): {', '.join(sorted(unknown))}")
+    return spaces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall / latency evaluation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="export live index vectors and queries to EVAL_DIR")
+    p.add_argument("--queries", help="text file, one search query per line")
+
+    p = sub.add_parser("truth", help="exact top-k by brute force (offline)")
+    p.add_argument("--space", type=space_list, default=["l2"])
+    p.add_argument("-k", type=int, default=10)
+
+    p = sub.add_parser("sweep", help="recall@k vs latency over HNSW parameters")
+    p.add_argument("--m", type=int_list, default=[16])
+    p.add_argument("--ef-construction", type=int_list, default=[128])
+    p.add_argument("--ef-search", type=int_list, default=[32, 64, 128, 256, 512])
+    p.add_argument("--space", type=space_list, default=["l2"])
+    p.add_argument("-k", type=int, default=10)
+    p.add_argument("--segments", type=int, default=BULK_FORCE_MERGE_SEGMENTS,
+                   help="force-merge each build to this many segments "
+                        "(default BULK_FORCE_MERGE_SEGMENTS, like the loader; 0 = as loaded)")
+    p.add_argument("--keep", action="store_true", help=f"keep {EVAL_INDEX} after the sweep")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.queries)
+    elif args.command == "truth":
+        for space in args.space:
+            ground_truth(space, args.k)
+        log_success(f"Ground truth saved to {EVAL_DIR}")
+    else:
+        sweep(args.m, args.ef_construction, args.ef_search, args.space, args.k,
+              args.segments, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,22 @@
 FINAL PRODUCTION PIPELINE
 JSONL → normalize → image_to_text flatten → EN/AR search fields →
 combined_text → dedupe → embedding → OpenSearch bulk upload
+
+Every stage is streamed batch by batch; nothing holds the whole catalog.
 """
 
 import os
+import re
 import json
+import time
+import sqlite3
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager, ExitStack
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List, Iterable, Optional, Tuple
+from typing import Callable, Dict, Any, List, Iterable, Optional, Tuple, Union
 
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
@@ -16,6 +26,11 @@ import numpy as np
 import torch
 import uuid   # NEW: for fallback ID creation
 
+from embedding_cache import EmbeddingCache
+from checkpoints import IngestCheckpoint
+from projection import Projection
+from quantization import Quantizer
+
 # ---------------------------------------------------
 # BASE DIR & ENV
 # ---------------------------------------------------
@@ -52,6 +67,80 @@ EMBED_MODEL_NAME = os.getenv("EMBED_MODEL")
 # REMOVE old EMBED_DIM environment requirement
 # EMBED_DIM = int(os.getenv("EMBED_DIM"))
 
+# EMBED_BATCH_SIZE: documents encoded per SentenceTransformer.encode() call
+# EMBED_WORKERS:    >1 fans batches out over a multi-process encode pool
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", 0))
+
+# EMBED_CACHE_DIR:     persistent embedding cache ("" disables it)
+# EMBED_CACHE_COMPACT: drop cache rows not used by a complete run
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", str(BASE_DIR / ".embedding_cache"))
+EMBED_CACHE_COMPACT = os.getenv("EMBED_CACHE_COMPACT", "1") == "1"
+
+# RERANK_TEXT_MAX_WORDS: word budget of the compact rerank_text field the
+# backend cross-encoder scores (≈1.3 tokens per word for EN; AR runs higher)
+RERANK_TEXT_MAX_WORDS = int(os.getenv("RERANK_TEXT_MAX_WORDS", 96))
+
+# VECTOR_PROJECTION_DIM:    >0 → PCA-project stored embeddings to this many dims
+#                           (fitted on PROJECTION_SAMPLES, saved to PROJECTION_ARTIFACT_PATH)
+# PROJECTION_REFIT:         fit a new projection even if a matching one exists
+VECTOR_PROJECTION_DIM = int(os.getenv("VECTOR_PROJECTION_DIM", 0))
+PROJECTION_ARTIFACT_PATH = Path(os.getenv("PROJECTION_ARTIFACT_PATH", BASE_DIR / "artifacts" / "projection.npz"))
+PROJECTION_SAMPLES = int(os.getenv("PROJECTION_SAMPLES", 20000))
+PROJECTION_REFIT = os.getenv("PROJECTION_REFIT", "0") == "1"
+
+# VECTOR_QUANTIZATION:       "none" | "byte" → int8 vectors in the HNSW graph (lucene
+#                            data_type byte, 4x smaller) + the float vector kept
+#                            unindexed as embedding_fp32 for exact rescoring
+# QUANT_ARTIFACT_PATH:       calibration artifact, shared with the backend
+# QUANT_CALIBRATION_SAMPLES: catalog embeddings sampled (across all files) to calibrate
+# QUANT_RECALIBRATE:         fit a new artifact even if a matching one exists
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+QUANT_ARTIFACT_PATH = Path(os.getenv("QUANT_ARTIFACT_PATH", BASE_DIR / "artifacts" / "quantization.json"))
+QUANT_CALIBRATION_SAMPLES = int(os.getenv("QUANT_CALIBRATION_SAMPLES", 20000))
+QUANT_CLIP_PERCENTILE = float(os.getenv("QUANT_CLIP_PERCENTILE", 99.9))
+QUANT_RECALIBRATE = os.getenv("QUANT_RECALIBRATE", "0") == "1"
+
+# DEDUPE_STORE: "memory" keeps 8-byte key hashes in a set,
+#               "disk" keeps them in a throwaway SQLite file (flat RSS)
+DEDUPE_STORE = os.getenv("DEDUPE_STORE", "memory")
+DEDUPE_DB_PATH = Path(os.getenv("DEDUPE_DB_PATH", BASE_DIR / ".dedupe.sqlite"))
+
+# BULK_CHUNK_DOCS / BULK_CHUNK_BYTES: a bulk request closes at whichever comes first
+# BULK_THREADS / BULK_MAX_INFLIGHT:   upload threads and max outstanding requests
+# BULK_MAX_RETRIES / *_BACKOFF:       429 retries with exponential backoff (seconds)
+BULK_CHUNK_DOCS = int(os.getenv("BULK_CHUNK_DOCS", 500))
+BULK_CHUNK_BYTES = int(os.getenv("BULK_CHUNK_BYTES", 10 * 1024 * 1024))
+BULK_THREADS = int(os.getenv("BULK_THREADS", 4))
+BULK_MAX_INFLIGHT = int(os.getenv("BULK_MAX_INFLIGHT", BULK_THREADS))
+BULK_MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", 5))
+BULK_INITIAL_BACKOFF = float(os.getenv("BULK_INITIAL_BACKOFF", 2))
+BULK_MAX_BACKOFF = float(os.getenv("BULK_MAX_BACKOFF", 60))
+# BULK_LOAD_MODE:            refresh_interval=-1 / replicas=0 while loading, restored afterwards
+# BULK_FORCE_MERGE_SEGMENTS: >0 force-merges to that many segments after the load
+BULK_LOAD_MODE = os.getenv("BULK_LOAD_MODE", "1") == "1"
+BULK_FORCE_MERGE_SEGMENTS = int(os.getenv("BULK_FORCE_MERGE_SEGMENTS", 0))
+BULK_FAILURES_PATH = Path(os.getenv("BULK_FAILURES_PATH", BASE_DIR / "bulk_failures.jsonl"))
+
+# REINDEX_VERSIONED:     build into OPENSEARCH_INDEX_v{N} and swap the OPENSEARCH_INDEX alias
+# REINDEX_KEEP_VERSIONS: versioned indexes kept after the swap (including the live one)
+# REINDEX_MIN_DOC_RATIO: new index must hold at least this share of the live doc count
+REINDEX_VERSIONED = os.getenv("REINDEX_VERSIONED", "1") == "1"
+REINDEX_KEEP_VERSIONS = int(os.getenv("REINDEX_KEEP_VERSIONS", 2))
+REINDEX_MIN_DOC_RATIO = float(os.getenv("REINDEX_MIN_DOC_RATIO", 0.9))
+REINDEX_WARMUP_QUERIES = int(os.getenv("REINDEX_WARMUP_QUERIES", 20))
+
+# INDEX_PER_STORE: one index per store (OPENSEARCH_INDEX_{store}_v{N}) instead
+# of one shared index. OPENSEARCH_INDEX still spans all of them and
+# OPENSEARCH_INDEX_{store} points at a single store. Needs REINDEX_VERSIONED=1.
+INDEX_PER_STORE = os.getenv("INDEX_PER_STORE", "0") == "1"
+
+# INGEST_RESUME:       continue an unfinished run from CHECKPOINT_PATH
+# CHECKPOINT_INTERVAL: seconds between checkpoint writes
+INGEST_RESUME = os.getenv("INGEST_RESUME", "1") == "1"
+CHECKPOINT_PATH = Path(os.getenv("CHECKPOINT_PATH", BASE_DIR / ".ingest_checkpoint.json"))
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", 10))
+
 OPENSEARCH_PASSWORD = os.getenv("OPENSEARCH_PASSWORD")
 if not OPENSEARCH_PASSWORD:
     raise ValueError("OPENSEARCH_PASSWORD is required in .env.local")
@@ -60,6 +149,35 @@ device = "cuda" if torch.cuda.is_available() else "cpu"
 log_info(f"Device selected: {device}")
 
 
+# ---------------------------------------------------
+# STAGE TIMING
+# ---------------------------------------------------
+class StageStats:
+    """Wall-clock seconds and document counts per pipeline stage."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.docs = defaultdict(int)
+
+    @contextmanager
+    def track(self, stage: str, n: int = 0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, n, time.perf_counter() - start)
+
+    def add(self, stage: str, n: int, seconds: float):
+        self.seconds[stage] += seconds
+        self.docs[stage] += n
+
+    def report(self):
+        for stage, seconds in self.seconds.items():
+            n = self.docs[stage]
+            rate = n / seconds if seconds > 0 else 0.0
+            log_info(f"[{stage}] {n} docs in {seconds:.1f}s → {rate:.1f} docs/sec")
+
+
 # ---------------------------------------------------
 # BASIC HELPERS
 # ---------------------------------------------------
@@ -75,6 +193,16 @@ def dedup_words(text: str) -> str:
     return " ".join(out)
 
 
+def parse_price(value) -> Optional[float]:
+    """Numeric price from a number or a string like "1,299.00 SAR"; None if absent."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = re.search(r"\d[\d,]*(?:\.\d+)?", str(value))
+    return float(m.group().replace(",", "")) if m else None
+
+
 def extract_image_text(prod: Dict[str, Any]) -> str:
     items = prod.get("img_to_text") or []
     parts = []
@@ -142,6 +270,36 @@ def build_combined_text(doc, en, ar, image_text):
     return dedup_words(" ".join(p.strip() for p in parts if p))
 
 
+def build_rerank_text(doc, image_text, max_words=RERANK_TEXT_MAX_WORDS):
+    """
+    Compact text for the backend cross-encoder. Fields are taken in
+    priority order (identity first, long descriptions last) until the
+    word budget is spent.
+    """
+    parts = [
+        doc.get("title_en"),
+        doc.get("brand"),
+        doc.get("product_group"),
+        doc.get("category_en"),
+        doc.get("title_ar"),
+        " ".join(doc.get("tags_en") or []),
+        image_text,
+        doc.get("text_en"),
+    ]
+
+    out, seen = [], set()
+    for p in parts:
+        for w in str(p or "").split():
+            k = w.lower()
+            if k in seen:
+                continue
+            out.append(w)
+            seen.add(k)
+            if len(out) >= max_words:
+                return " ".join(out)
+    return " ".join(out)
+
+
 # ---------------------------------------------------
 # DEDUP KEYS
 # ---------------------------------------------------
@@ -158,31 +316,79 @@ def make_dedupe_key(doc: Dict[str, Any]) -> Optional[Tuple]:
     return None
 
 
-def dedupe_docs(docs: List[Dict[str, Any]]):
-    seen = set()
-    out = []
-    for d in docs:
-        key = make_dedupe_key(d)
-        if key and key in seen:
-            continue
-        if key:
-            seen.add(key)
-        out.append(d)
-    log_info(f"Dedup: {len(docs)} → {len(out)}")
-    return out
+def hash_dedupe_key(key: Tuple) -> int:
+    raw = "\x1f".join(key).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big", signed=True)
+
+
+class DedupeIndex:
+    """
+    Compact seen-set for streaming dedupe.
+    Keys are reduced to signed 64-bit hashes and kept either in memory
+    or in a SQLite file that is recreated on every run.
+    """
+
+    def __init__(self, store: str = DEDUPE_STORE, path: Path = DEDUPE_DB_PATH):
+        self.total = 0
+        self.kept = 0
+        self._seen = None
+        self._db = None
+
+        if store == "disk":
+            path.unlink(missing_ok=True)
+            self._db = sqlite3.connect(str(path))
+            self._db.execute("PRAGMA journal_mode=OFF")
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute("CREATE TABLE seen (k INTEGER PRIMARY KEY)")
+            self._path = path
+        elif store == "memory":
+            self._seen = set()
+        else:
+            raise ValueError(f"Unknown DEDUPE_STORE: {store}")
+
+    def add(self, doc: Dict[str, Any]) -> bool:
+        """Return True if the doc is new, False if it is a duplicate."""
+        self.total += 1
+        key = make_dedupe_key(doc)
+
+        if key is not None:
+            h = hash_dedupe_key(key)
+            if self._db is not None:
+                cur = self._db.execute("INSERT OR IGNORE INTO seen (k) VALUES (?)", (h,))
+                if cur.rowcount == 0:
+                    return False
+            else:
+                if h in self._seen:
+                    return False
+                self._seen.add(h)
+
+        self.kept += 1
+        return True
+
+    def close(self):
+        log_info(f"Dedup: {self.total} → {self.kept}")
+        if self._db is not None:
+            self._db.close()
+            self._path.unlink(missing_ok=True)
 
 
 # ---------------------------------------------------
 # RAW FILES
 # ---------------------------------------------------
-def iter_raw_documents():
-    log_info(f"Scanning JSONL files under {DATA_ROOT} ...")
-
-    for path in DATA_ROOT.rglob("*.jsonl"):
-        group = path.parent.name
-        log_info(f"Reading: {path}")
-
-        for line in path.open("r", encoding="utf-8"):
+def iter_jsonl(path: Path, offset: int = 0, line_no: int = 0, complete_only: bool = False):
+    """
+    Yield (line number, byte offset after the line, raw dict) from `offset` on.
+    complete_only stops at a trailing line that is still being written.
+    """
+    with path.open("rb") as f:
+        f.seek(offset)
+        for raw_line in f:
+            if complete_only and not raw_line.endswith(b"\n"):
+                return
+            line_no += 1
+            offset += len(raw_line)
+
+            line = raw_line.decode("utf-8")
             if not line.strip():
                 continue
 
@@ -193,101 +399,805 @@ def iter_raw_documents():
                 print("BROKEN JSON LINE →", repr(clean_line[:200]))
                 raise e
 
-            images = raw.get("image_urls") or []
-            image_url = images[0] if images else None
+            yield line_no, offset, raw
 
-            doc = {
-                "id": str(raw.get("id")),
-                "store": raw.get("store") or "Jarir",
-                "product_group": group,
-                "url": raw.get("url") or raw.get("url_en"),
-                "brand": raw.get("brand"),
 
-                # PRICE FIX
-                "price_final": raw.get("price_sar") or raw.get("price_aed") or None,
-                "currency": "SAR" if raw.get("price_sar") else ("AED" if raw.get("price_aed") else None),
+def iter_raw_documents(checkpoint: Optional[IngestCheckpoint] = None):
+    log_info(f"Scanning JSONL files under {DATA_ROOT} ...")
 
-                "title_en": raw.get("title_en"),
-                "title_ar": raw.get("title_ar"),
+    for path in sorted(DATA_ROOT.rglob("*.jsonl")):
+        group = path.parent.name
+        source = str(path)
+        offset, line_no = 0, 0
 
-                "category_en": raw.get("category_en") or raw.get("category"),
-                "category_ar": raw.get("category_ar"),
+        if checkpoint is not None:
+            offset, line_no, done = checkpoint.resume_point(source)
+            if done:
+                log_info(f"Skipping (checkpoint): {path}")
+                continue
 
-                "tags_en": raw.get("tags_en") or [],
-                "tags_ar": raw.get("tags_ar") or [],
+        log_info(f"Reading: {path}" + (f" from line {line_no + 1}" if line_no else ""))
 
-                "text_en": raw.get("text_en") or raw.get("description_en") or "",
-                "text_ar": raw.get("text_ar") or raw.get("description_ar") or "",
+        for line_no, offset, raw in iter_jsonl(path, offset, line_no):
+            doc = normalize_raw(raw, group)
+            if checkpoint is not None:
+                doc["_ref"] = (source, line_no, offset)
+                checkpoint.dispatched(doc["_ref"])
+            yield doc
 
-                "img_to_text": raw.get("img_to_text") or [],
-                "image_url": image_url,
-                "image_urls": images,
-                "image_paths": raw.get("image_paths") or [],
-            }
+        if checkpoint is not None:
+            checkpoint.file_read(source)
 
 
-            yield doc
+def normalize_raw(raw: Dict[str, Any], group: str) -> Dict[str, Any]:
+    images = raw.get("image_urls") or []
+    image_url = images[0] if images else None
+
+    doc = {
+        "id": str(raw["id"]) if raw.get("id") else None,
+        "store": raw.get("store") or "Jarir",
+        "product_group": group,
+        "url": raw.get("url") or raw.get("url_en"),
+        "brand": raw.get("brand"),
+
+        # PRICE FIX (mapped as float → always numeric)
+        "price_final": parse_price(raw.get("price_sar")) or parse_price(raw.get("price_aed")),
+        "currency": "SAR" if raw.get("price_sar") else ("AED" if raw.get("price_aed") else None),
+
+        "title_en": raw.get("title_en"),
+        "title_ar": raw.get("title_ar"),
+
+        "category_en": raw.get("category_en") or raw.get("category"),
+        "category_ar": raw.get("category_ar"),
+
+        "tags_en": raw.get("tags_en") or [],
+        "tags_ar": raw.get("tags_ar") or [],
+
+        "text_en": raw.get("text_en") or raw.get("description_en") or "",
+        "text_ar": raw.get("text_ar") or raw.get("description_ar") or "",
+
+        "img_to_text": raw.get("img_to_text") or [],
+        "image_url": image_url,
+        "image_urls": images,
+        "image_paths": raw.get("image_paths") or [],
+    }
+
+    return doc
 
 
 # ---------------------------------------------------
 # EMBEDDING + BULK
 # ---------------------------------------------------
-def iter_actions(embedder, docs, EMBED_DIM):
-    for i, doc in enumerate(docs, 1):
+def iter_batches(items: Iterable, size: int) -> Iterable[List]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def normalize_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    # build normalized fields
+    image_text = extract_image_text(doc)
+    en = build_search_text_en(doc)
+    ar = build_search_text_ar(doc)
+
+    doc["text_search_en"] = en
+    doc["text_search_ar"] = ar
+    doc["image_text"] = image_text
+    doc["combined_text"] = build_combined_text(doc, en, ar, image_text)
+    doc["rerank_text"] = build_rerank_text(doc, image_text)
+    return doc
+
+
+def start_encode_pool(embedder):
+    """
+    Multi-process encode pool (EMBED_WORKERS > 1).
+    Every worker receives a copy of the already loaded model.
+    """
+    if EMBED_WORKERS <= 1:
+        return None
+
+    devices = None if device == "cuda" else ["cpu"] * EMBED_WORKERS
+    log_info(f"Starting encode pool: workers={EMBED_WORKERS} device={device}")
+    return embedder.start_multi_process_pool(target_devices=devices)
+
+
+class EmbedStage:
+    """
+    Batched embedding: cache lookup → encode misses (optionally on a
+    process pool) → cache store.
+    """
+
+    def __init__(self, embedder, dim: int, stats: StageStats, cache: Optional[EmbeddingCache] = None,
+                 quantizer: Optional[Quantizer] = None, projection: Optional[Projection] = None):
+        self.embedder = embedder
+        self.dim = dim
+        self.stats = stats
+        self.cache = cache
+        self.projection = projection    # set → stored vectors are PCA-projected
+        self.quantizer = quantizer      # set → stored vectors are int8
+        self.pool = start_encode_pool(embedder)
+
+        # a pool gets one chunk of EMBED_BATCH_SIZE per worker per dispatch
+        self.dispatch_size = EMBED_BATCH_SIZE * (EMBED_WORKERS if self.pool is not None else 1)
+
+    @property
+    def index_dim(self) -> int:
+        return self.projection.out_dim if self.projection is not None else self.dim
+
+    @property
+    def vector_space(self) -> str:
+        """Identity of the float vectors that get stored (model + projection)."""
+        if self.projection is None:
+            return EMBED_MODEL_NAME
+        return f"{EMBED_MODEL_NAME}+pca:{self.projection.version}"
+
+    def index_vectors(self, texts: List[str]) -> np.ndarray:
+        """Float vectors as stored: encoded (cached as model output), then projected."""
+        vecs = self.encode(texts)
+        if self.projection is not None:
+            with self.stats.track("project", len(texts)):
+                vecs = self.projection.apply(vecs)
+        return vecs
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if self.cache is None:
+            with self.stats.track("embed", len(texts)):
+                return self._encode(texts)
+
+        with self.stats.track("cache", len(texts)):
+            keys, vecs, missing = self.cache.lookup(texts)
+
+        if missing:
+            with self.stats.track("embed", len(missing)):
+                fresh = self._encode([texts[i] for i in missing])
+            vecs[missing] = fresh
+            self.cache.put([keys[i] for i in missing], fresh)
+
+        return vecs
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self.pool is not None:
+            vecs = self.embedder.encode_multi_process(
+                texts, self.pool, batch_size=EMBED_BATCH_SIZE, chunk_size=EMBED_BATCH_SIZE
+            )
+        else:
+            vecs = self.embedder.encode(texts, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True)
+
+        if vecs.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension mismatch: got {vecs.shape[1]}, expected {self.dim}"
+            )
+        return vecs
 
-        # build normalized fields
-        image_text = extract_image_text(doc)
-        en = build_search_text_en(doc)
-        ar = build_search_text_ar(doc)
-        combined = build_combined_text(doc, en, ar, image_text)
+    def close(self, complete: bool = False):
+        if self.pool is not None:
+            SentenceTransformer.stop_multi_process_pool(self.pool)
+            self.pool = None
 
-        doc["text_search_en"] = en
-        doc["text_search_ar"] = ar
-        doc["image_text"] = image_text
-        doc["combined_text"] = combined
+        if self.cache is not None:
+            log_info(f"Embedding cache: hits={self.cache.hits} misses={self.cache.misses}")
+            self.cache.close(compact=complete and EMBED_CACHE_COMPACT)
 
-        # embedding
-        emb_input = f"query: {combined}"
-        vec = embedder.encode(emb_input, convert_to_numpy=True)
 
-        if vec.shape[0] != EMBED_DIM:
-            raise ValueError(
-                f"Embedding dimension mismatch: got {vec.shape[0]}, expected {EMBED_DIM}"
-            )
+# ---------------------------------------------------
+# VECTOR ARTIFACTS (PROJECTION + QUANTIZATION)
+# ---------------------------------------------------
+def calibration_texts(n: int) -> List[str]:
+    """Embedding inputs of up to `n` docs, taken evenly from the head of every file."""
+    paths = sorted(DATA_ROOT.rglob("*.jsonl"))
+    per_file = max(1, -(-n // max(len(paths), 1)))
+
+    texts = []
+    for path in paths:
+        for _, _, raw in islice(iter_jsonl(path), per_file):
+            doc = normalize_doc(normalize_raw(raw, path.parent.name))
+            texts.append(f"query: {doc['combined_text']}")
+    return texts[:n]
+
+
+def sample_vectors(embed: EmbedStage, n: int) -> np.ndarray:
+    texts = calibration_texts(n)
+    return np.concatenate([embed.index_vectors(b) for b in iter_batches(texts, embed.dispatch_size)])
+
+
+def load_projection(embed: EmbedStage, refit: bool = True) -> Optional[Projection]:
+    """
+    The PCA projection for this model and VECTOR_PROJECTION_DIM, fitting
+    (and saving) one when none matches or PROJECTION_REFIT=1.
+    """
+    if VECTOR_PROJECTION_DIM <= 0:
+        return None
+
+    projection = Projection.load(PROJECTION_ARTIFACT_PATH)
+    usable = projection is not None and projection.matches(
+        EMBED_MODEL_NAME, embed.dim, VECTOR_PROJECTION_DIM
+    )
 
-        doc["embedding"] = vec.tolist()
+    if usable and not (refit and PROJECTION_REFIT):
+        log_info(f"Projection artifact {projection.version} ({PROJECTION_ARTIFACT_PATH})")
+        return projection
+    if not refit:
+        raise RuntimeError(f"No usable projection artifact at {PROJECTION_ARTIFACT_PATH}")
+
+    vecs = sample_vectors(embed, PROJECTION_SAMPLES)
+    log_info(f"Fitting PCA {embed.dim} → {VECTOR_PROJECTION_DIM} on {len(vecs)} embeddings...")
+    projection = Projection.fit(vecs, VECTOR_PROJECTION_DIM, EMBED_MODEL_NAME)
+    projection.save(PROJECTION_ARTIFACT_PATH)
+    log_success(
+        f"Projection artifact {projection.version} saved to {PROJECTION_ARTIFACT_PATH} "
+        f"(explained variance {projection.explained:.1%})"
+    )
+    return projection
+
+
+def load_quantizer(embed: EmbedStage, refit: bool = True) -> Optional[Quantizer]:
+    """
+    The quantization artifact for this model, fitting (and saving) one
+    when none matches or QUANT_RECALIBRATE=1. Calibration embeddings go
+    through the embedding cache, so the main pass does not re-encode them.
+    Fitted on projected vectors when a projection is active.
+    """
+    if VECTOR_QUANTIZATION == "none":
+        return None
+    if VECTOR_QUANTIZATION != "byte":
+        raise ValueError(f"Unknown VECTOR_QUANTIZATION: {VECTOR_QUANTIZATION}")
+
+    quantizer = Quantizer.load(QUANT_ARTIFACT_PATH)
+    usable = quantizer is not None and quantizer.matches(embed.vector_space, embed.index_dim)
+
+    if usable and not (refit and QUANT_RECALIBRATE):
+        log_info(f"Quantization artifact {quantizer.version} ({QUANT_ARTIFACT_PATH})")
+        return quantizer
+    if not refit:
+        raise RuntimeError(f"No usable quantization artifact at {QUANT_ARTIFACT_PATH}")
+
+    vecs = sample_vectors(embed, QUANT_CALIBRATION_SAMPLES)
+    log_info(f"Calibrating int8 quantization on {len(vecs)} embeddings...")
+    quantizer = Quantizer.fit(vecs, embed.vector_space, QUANT_CLIP_PERCENTILE)
+    quantizer.save(QUANT_ARTIFACT_PATH)
+    log_success(f"Quantization artifact {quantizer.version} saved to {QUANT_ARTIFACT_PATH}")
+    return quantizer
+
+
+def fallback_id(doc: Dict[str, Any]) -> str:
+    # derived from the dedupe key so reruns overwrite instead of duplicating
+    key = make_dedupe_key(doc)
+    if key is None:
+        return str(uuid.uuid4())
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "\x1f".join(key)))
+
+
+# target index name, or a function picking one per document
+IndexSpec = Union[str, Callable[[Dict[str, Any]], str]]
+
+
+def iter_actions(embed: EmbedStage, docs, dedupe: DedupeIndex, index: IndexSpec,
+                 checkpoint: Optional[IngestCheckpoint] = None):
+    stats = embed.stats
+    processed = 0
+
+    for batch in iter_batches(docs, embed.dispatch_size):
+        # normalize first so dedupe can fall back to combined_text
+        with stats.track("normalize", len(batch)):
+            kept = []
+            for doc in map(normalize_doc, batch):
+                if dedupe.add(doc):
+                    kept.append(doc)
+                elif checkpoint is not None:
+                    checkpoint.skipped(doc["_ref"])
+            batch = kept
+
+        if not batch:
+            continue
 
         # ID FIX — ensure unique + propagate to _source
-        _id = doc.get("id") or str(uuid.uuid4())
-        doc["id"] = _id  # <<< BUNU EKLEDİK
+        for doc in batch:
+            doc["id"] = doc.get("id") or fallback_id(doc)
+
+        yield from embed_actions(embed, batch, index)
 
-        if i % 300 == 0:
-            log_info(f"Processed {i} docs...")
+        if processed // 300 != (processed + len(batch)) // 300:
+            log_info(f"Processed {processed + len(batch)} docs...")
+        processed += len(batch)
 
+
+def embed_actions(embed: EmbedStage, batch: List[Dict[str, Any]], index: IndexSpec):
+    """Embed one batch of normalized docs and yield their index actions."""
+    vecs = embed.index_vectors([f"query: {d['combined_text']}" for d in batch])
+    stored = embed.quantizer.quantize(vecs) if embed.quantizer is not None else vecs
+
+    for doc, vec, q in zip(batch, vecs, stored):
+        doc["embedding"] = q.tolist()
+        if embed.quantizer is not None:
+            doc["embedding_fp32"] = vec.tolist()
         yield {
-            "_index": OPENSEARCH_INDEX,
-            "_id": _id,
+            "_index": index(doc) if callable(index) else index,
+            "_id": doc["id"],
+            "_ref": doc.pop("_ref", None),   # ignored by the bulk helpers
             "_source": doc,
         }
 
+
+# ---------------------------------------------------
+# PARALLEL BULK UPLOAD
+# ---------------------------------------------------
+def serialize_action(action: Dict[str, Any]) -> int:
+    """Serialize _source once (the client passes strings through) and return its size."""
+    src = action.get("_source")
+    if src is None:
+        return 0
+    if not isinstance(src, str):
+        src = json.dumps(src, ensure_ascii=False, separators=(",", ":"))
+        action["_source"] = src
+    return len(src.encode("utf-8"))
+
+
+def iter_chunks(actions: Iterable[Dict[str, Any]], chunk_docs: int = BULK_CHUNK_DOCS):
+    chunk, size = [], 0
+    for action in actions:
+        n = serialize_action(action)
+        if chunk and (len(chunk) >= chunk_docs or size + n > BULK_CHUNK_BYTES):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(action)
+        size += n
+    if chunk:
+        yield chunk
+
+
+class BulkUploader:
+    """
+    Parallel, back-pressured bulk upload.
+    Producing actions (embedding) continues in the calling thread while up to
+    BULK_MAX_INFLIGHT chunks are being sent. 429s are retried with backoff;
+    every other per-document failure is written to `failures_path`
+    (BULK_FAILURES_PATH by default).
+    """
+
+    def __init__(self, client, stats: StageStats, on_chunk=None, append_failures: bool = False,
+                 chunk_docs: int = BULK_CHUNK_DOCS, failures_path: Path = BULK_FAILURES_PATH):
+        self.client = client
+        self.stats = stats
+        self.on_chunk = on_chunk          # called with (chunk, failures) per finished chunk
+        self.chunk_docs = chunk_docs
+        self.success = 0
+        self.failed = 0
+        self.failures_path = Path(failures_path)
+        self._failures = None
+        self._failures_mode = "a" if append_failures else "w"
+
+    def run(self, actions: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+        self._failures = self.failures_path.open(self._failures_mode, encoding="utf-8")
+        try:
+            with ThreadPoolExecutor(max_workers=BULK_THREADS) as pool:
+                inflight = set()
+                for chunk in iter_chunks(actions, self.chunk_docs):
+                    while len(inflight) >= BULK_MAX_INFLIGHT:
+                        done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                        for f in done:
+                            self._collect(*f.result())
+                    inflight.add(pool.submit(self._send, chunk))
+
+                for f in wait(inflight).done:
+                    self._collect(*f.result())
+        finally:
+            self._failures.close()
+
+        if self.failed:
+            log_error(f"Bulk failures: {self.failed} (see {self.failures_path})")
+        elif self.failures_path.stat().st_size == 0:
+            self.failures_path.unlink(missing_ok=True)
+
+        return self.success, self.failed
+
+    def _send(self, chunk: List[Dict[str, Any]]):
+        failures = []
+        start = time.perf_counter()
+
+        for ok, item in helpers.streaming_bulk(
+            self.client,
+            chunk,
+            chunk_size=len(chunk),
+            max_chunk_bytes=BULK_CHUNK_BYTES * 2,   # already chunked
+            max_retries=BULK_MAX_RETRIES,
+            initial_backoff=BULK_INITIAL_BACKOFF,
+            max_backoff=BULK_MAX_BACKOFF,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            op, info = next(iter(item.items()))
+            # deleting a product that is already gone is not a failure
+            if not ok and not (op == "delete" and info.get("status") == 404):
+                failures.append({
+                    "op": op,
+                    "_id": info.get("_id"),
+                    "status": info.get("status"),
+                    "error": info.get("error") or info.get("exception"),
+                })
+
+        return chunk, failures, time.perf_counter() - start
+
+    def _collect(self, chunk, failures, seconds):
+        self.success += len(chunk) - len(failures)
+        self.failed += len(failures)
+        self.stats.add("bulk", len(chunk), seconds)
+
+        for f in failures:
+            if self.failed <= 10:
+                log_error(f"Bulk failure id={f['_id']} status={f['status']}: {f['error']}")
+            self._failures.write(json.dumps(f, ensure_ascii=False, default=str) + "\n")
+
+        if self.on_chunk is not None:
+            self.on_chunk(chunk, failures)
+
+
+# ---------------------------------------------------
+# BULK-LOAD MODE
+# ---------------------------------------------------
+def get_load_settings(client, index: str) -> Dict[str, Any]:
+    settings = client.indices.get_settings(index=index)[index]["settings"]["index"]
+    return {
+        # None resets refresh_interval to the cluster default on restore
+        "refresh_interval": settings.get("refresh_interval"),
+        "number_of_replicas": settings.get("number_of_replicas"),
+    }
+
+
+@contextmanager
+def bulk_load_mode(client, index: str, original: Optional[Dict[str, Any]] = None):
+    """
+    Turn off refresh and replicas for the duration of a bulk load so the
+    HNSW graphs are built once per segment instead of on every refresh.
+    The original settings are restored even if the load fails; a resumed
+    run passes the settings saved by the interrupted one.
+    """
+    if not BULK_LOAD_MODE:
+        yield
+        return
+
+    original = original or get_load_settings(client, index)
+    log_info(f"Bulk-load mode ON for {index} (saved {original})")
+    client.indices.put_settings(
+        index=index,
+        body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}},
+    )
+
+    try:
+        yield
+    finally:
+        client.indices.put_settings(index=index, body={"index": original})
+        client.indices.refresh(index=index)
+        log_info(f"Bulk-load mode OFF for {index} (restored {original})")
+
+    if BULK_FORCE_MERGE_SEGMENTS > 0:
+        log_info(f"Force-merging {index} to {BULK_FORCE_MERGE_SEGMENTS} segment(s)...")
+        start = time.perf_counter()
+        client.indices.forcemerge(
+            index=index,
+            max_num_segments=BULK_FORCE_MERGE_SEGMENTS,
+            request_timeout=3600,
+        )
+        log_success(f"Force-merge done in {time.perf_counter() - start:.1f}s")
+
+
+# ---------------------------------------------------
+# VERSIONED INDEXES + ALIAS
+# ---------------------------------------------------
+# OPENSEARCH_INDEX_v{N} or, with INDEX_PER_STORE, OPENSEARCH_INDEX_{store}_v{N}
+VERSION_RE = re.compile(rf"^{re.escape(OPENSEARCH_INDEX)}_(?:([a-z0-9_]+)_)?v(\d+)$")
+
+
+def store_key(store: Optional[str]) -> str:
+    """Index-name-safe store key; the backend derives store aliases the same way."""
+    return re.sub(r"[^a-z0-9]+", "_", (store or "").lower()).strip("_") or "unknown"
+
+
+def store_alias(key: str) -> str:
+    return f"{OPENSEARCH_INDEX}_{key}"
+
+
+def index_body(dim: int, quantizer: Optional[Quantizer] = None,
+               projection: Optional[Projection] = None) -> Dict[str, Any]:
+    body = {
+        "settings": {
+            "index": {
+                "knn": True,
+                "knn.algo_param.ef_search": 512
+            },
+            "analysis": {
+                "normalizer": {
+                    "lowercase_normalizer": {
+                        "type": "custom",
+                        "filter": ["lowercase", "asciifolding"]
+                    }
+                }
+            }
+        },
+        "mappings": {
+            "properties": {
+                # filter fields (backend SearchFilters), matched case-insensitively
+                "store": {"type": "keyword", "normalizer": "lowercase_normalizer"},
+                "brand": {"type": "keyword", "normalizer": "lowercase_normalizer"},
+                "product_group": {"type": "keyword", "normalizer": "lowercase_normalizer"},
+                "price_final": {"type": "float"},
+                # only read back by the reranker, never searched
+                "rerank_text": {"type": "text", "index": False},
+                "embedding": {
+                    "type": "knn_vector",
+                    "dimension": dim,
+                    "method": {
+                        "name": "hnsw",
+                        "space_type": "l2",
+                        "engine": "lucene"
+                    }
+                }
+            }
+        }
+    }
+
+    # vector artifacts the backend must apply to query vectors
+    meta = body["mappings"]["_meta"] = {}
+    if projection is not None:
+        meta["projection"] = projection.version
+
+    if quantizer is not None:
+        props = body["mappings"]["properties"]
+        props["embedding"]["data_type"] = "byte"
+        # full precision for rescoring: kept in _source only, not in the graph
+        props["embedding_fp32"] = {"type": "float", "index": False, "doc_values": False}
+        meta["quantization"] = quantizer.version
+
+    return body
+
+
+def index_body_for(embed: EmbedStage) -> Dict[str, Any]:
+    """Mapping for the vectors `embed` produces (dimension follows the projection)."""
+    return index_body(embed.index_dim, embed.quantizer, embed.projection)
+
+
+def list_versions(client) -> List[Tuple[int, str]]:
+    names = client.indices.get(index=f"{OPENSEARCH_INDEX}_*", ignore_unavailable=True)
+    versions = []
+    for name in names:
+        m = VERSION_RE.match(name)
+        if m:
+            versions.append((int(m.group(2)), name))
+    return sorted(versions)
+
+
+def next_version(client) -> int:
+    versions = list_versions(client)
+    return versions[-1][0] + 1 if versions else 1
+
+
+def alias_targets(client, alias: str) -> List[str]:
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return sorted(client.indices.get_alias(name=alias).keys())
+
+
+def store_aliases(client) -> Dict[str, List[str]]:
+    """Per-store alias → the indices it points at."""
+    out = defaultdict(list)
+    res = client.indices.get_alias(index=f"{OPENSEARCH_INDEX}_*", ignore_unavailable=True)
+    for index, info in res.items():
+        for alias in info.get("aliases", {}):
+            if alias.startswith(f"{OPENSEARCH_INDEX}_"):
+                out[alias].append(index)
+    return dict(out)
+
+
+def create_versioned_index(client, body: Dict[str, Any]) -> str:
+    name = f"{OPENSEARCH_INDEX}_v{next_version(client)}"
+
+    log_info(f"Creating versioned index: {name}")
+    client.indices.create(index=name, body=body)
+    return name
+
+
+def warm_up(client, index: str):
+    """Run a handful of real kNN queries so the HNSW files are paged in."""
+    res = client.search(
+        index=index,
+        body={"size": REINDEX_WARMUP_QUERIES, "_source": ["embedding"], "query": {"match_all": {}}},
+    )
+    start = time.perf_counter()
+    for hit in res["hits"]["hits"]:
+        vec = hit["_source"].get("embedding")
+        if vec:
+            client.search(
+                index=index,
+                body={"size": 10, "_source": False, "query": {"knn": {"embedding": {"vector": vec, "k": 10}}}},
+            )
+    log_info(f"Warm-up: {len(res['hits']['hits'])} kNN queries in {time.perf_counter() - start:.2f}s")
+
+
+def check_doc_count(client, index: str, expected: int):
+    """`index` may be a comma-separated list (one index per store)."""
+    count = client.count(index=index)["count"]
+    # alias or, on the first versioned run, the concrete index swap_alias will delete
+    live = client.count(index=OPENSEARCH_INDEX)["count"] if client.indices.exists(OPENSEARCH_INDEX) else 0
+
+    if count == 0 or count < expected:
+        raise RuntimeError(f"{index} holds {count} docs, expected {expected}")
+    if live and count < live * REINDEX_MIN_DOC_RATIO:
+        raise RuntimeError(
+            f"{index} holds {count} docs, live {OPENSEARCH_INDEX} has {live} "
+            f"(REINDEX_MIN_DOC_RATIO={REINDEX_MIN_DOC_RATIO})"
+        )
+    log_success(f"Doc count check passed: {count} (live: {live})")
+
+
+def swap_alias(client, indices: Dict[str, str]):
+    """
+    Atomically point OPENSEARCH_INDEX at the new indices ({store key → index},
+    key "" for the single shared index) and every per-store alias at its
+    store's index. Per-store aliases of stores that are gone are removed.
+    """
+    actions = [
+        {"remove": {"index": old, "alias": OPENSEARCH_INDEX}}
+        for old in alias_targets(client, OPENSEARCH_INDEX)
+    ]
+
+    # first run after switching to versioned indexes: a concrete index
+    # still owns the alias name, drop it in the same atomic call
+    if not actions and client.indices.exists(OPENSEARCH_INDEX):
+        log_warn(f"Replacing concrete index {OPENSEARCH_INDEX} with an alias")
+        actions.append({"remove_index": {"index": OPENSEARCH_INDEX}})
+
+    for alias, olds in store_aliases(client).items():
+        actions.extend({"remove": {"index": old, "alias": alias}} for old in olds)
+
+    for key, index in sorted(indices.items()):
+        actions.append({"add": {"index": index, "alias": OPENSEARCH_INDEX}})
+        if key:
+            actions.append({"add": {"index": index, "alias": store_alias(key)}})
+
+    client.indices.update_aliases(body={"actions": actions})
+    for key, index in sorted(indices.items()):
+        log_success(f"Alias {store_alias(key) if key else OPENSEARCH_INDEX} → {index}")
+
+
+def rollback_alias(client) -> Dict[str, str]:
+    """
+    Point the aliases back at the newest version older than the live one
+    (kept by REINDEX_KEEP_VERSIONS). Returns the {store key → index} swapped in.
+    """
+    live = [int(m.group(2)) for m in map(VERSION_RE.match, alias_targets(client, OPENSEARCH_INDEX)) if m]
+    if not live:
+        raise RuntimeError(f"{OPENSEARCH_INDEX} does not point at a versioned index")
+
+    older = [n for n, _ in list_versions(client) if n < max(live)]
+    if not older:
+        raise RuntimeError(f"No version older than v{max(live)} is left to roll back to")
+
+    indices = {}
+    for n, name in list_versions(client):
+        if n == max(older):
+            indices[VERSION_RE.match(name).group(1) or ""] = name
+
+    log_warn(f"Rolling back {OPENSEARCH_INDEX} from v{max(live)} to v{max(older)}")
+    swap_alias(client, indices)
+    return indices
+
+
+def prune_versions(client):
+    live = set(alias_targets(client, OPENSEARCH_INDEX))
+    versions = list_versions(client)
+    keep = sorted({n for n, _ in versions}, reverse=True)[:REINDEX_KEEP_VERSIONS]
+
+    for n, name in versions:
+        if n in keep or name in live:
+            continue
+        client.indices.delete(index=name)
+        log_info(f"Pruned old version: {name}")
+
+
+# ---------------------------------------------------
+# TARGET INDEXES
+# ---------------------------------------------------
+class IndexTargets:
+    """
+    Where documents of one run go. Either the single index in
+    run["indices"][""], or with INDEX_PER_STORE one index per store,
+    created when that store's first document shows up. Each index is put
+    into bulk-load mode on `stack` as soon as it is opened; the checkpoint
+    keeps the index names and their original load settings.
+    """
+
+    def __init__(self, client, body: Dict[str, Any], checkpoint: IngestCheckpoint, stack: ExitStack):
+        self.client = client
+        self.body = body
+        self.checkpoint = checkpoint
+        self.stack = stack
+        self.run = checkpoint.run
+
+        for index in self.run["indices"].values():
+            self._open(index)
+
+    def route(self, doc: Dict[str, Any]) -> str:
+        if not INDEX_PER_STORE:
+            return self.run["indices"][""]
+
+        key = store_key(doc.get("store"))
+        index = self.run["indices"].get(key)
+        if index is None:
+            index = f"{store_alias(key)}_v{self.run['version']}"
+            log_info(f"Creating store index: {index}")
+            self.client.indices.create(index=index, body=self.body)
+            self.run["indices"][key] = index
+            self._open(index)
+        return index
+
+    def names(self) -> List[str]:
+        return sorted(self.run["indices"].values())
+
+    def _open(self, index: str):
+        if not BULK_LOAD_MODE:
+            return
+        saved = self.run["load_settings"]
+        if index not in saved:
+            saved[index] = get_load_settings(self.client, index)
+            # persisted before the settings change so a crash can restore them
+            self.checkpoint.save()
+        self.stack.enter_context(bulk_load_mode(self.client, index, saved[index]))
+
+
+# ---------------------------------------------------
+# CHECKPOINTS
+# ---------------------------------------------------
+def checkpoint_run_key() -> Dict[str, Any]:
+    return {
+        "data_root": str(DATA_ROOT),
+        "model": EMBED_MODEL_NAME,
+        "alias": OPENSEARCH_INDEX,
+        "versioned": REINDEX_VERSIONED,
+        "per_store": INDEX_PER_STORE,
+        "quantization": VECTOR_QUANTIZATION,
+        "projection_dim": VECTOR_PROJECTION_DIM,
+    }
+
+
+def open_checkpoint(client) -> Optional[IngestCheckpoint]:
+    """Return the checkpoint of an unfinished, compatible run, if any."""
+    checkpoint = IngestCheckpoint.load(CHECKPOINT_PATH)
+    if checkpoint is None:
+        return None
+
+    if not INGEST_RESUME:
+        log_info("INGEST_RESUME=0 → ignoring previous checkpoint")
+    elif not checkpoint.matches(**checkpoint_run_key()):
+        log_warn("Checkpoint belongs to a different configuration → starting over")
+    elif not all(client.indices.exists(i) for i in checkpoint.run.get("indices", {}).values()):
+        log_warn("Checkpoint target index is gone → starting over")
+    else:
+        return checkpoint
+
+    checkpoint.delete()
+    return None
+
+
 # ---------------------------------------------------
 # VERIFY
 # ---------------------------------------------------
-def verify(client):
-    client.indices.refresh(index=OPENSEARCH_INDEX)
+def verify(client, index: str):
+    client.indices.refresh(index=index)
 
-    if not client.indices.exists(OPENSEARCH_INDEX):
+    if not client.indices.exists(index):
         log_error("Index missing!")
         return
 
-    count = client.count(index=OPENSEARCH_INDEX)["count"]
+    count = client.count(index=index)["count"]
     log_info(f"Index count: {count}")
 
     if count == 0:
         log_warn("Index empty.")
         return
 
-    res = client.search(index=OPENSEARCH_INDEX, body={"size": 3, "query": {"match_all": {}}})
+    res = client.search(index=index, body={"size": 3, "query": {"match_all": {}}})
     for idx, hit in enumerate(res["hits"]["hits"], 1):
         src = hit["_source"]
         print(GREEN + f"\n--- SAMPLE #{idx} ---" + RESET)
@@ -303,15 +1213,18 @@ def verify(client):
 # ---------------------------------------------------
 # MAIN
 # ---------------------------------------------------
-def main():
+def load_embedder() -> Tuple[SentenceTransformer, int]:
     log_info(f"Loading model: {EMBED_MODEL_NAME}")
     embedder = SentenceTransformer(EMBED_MODEL_NAME, device=device)
 
     # AUTO DETECT DIM
-    EMBED_DIM = embedder.get_sentence_embedding_dimension()
-    log_success(f"Detected embedding dimension: {EMBED_DIM}")
+    dim = embedder.get_sentence_embedding_dimension()
+    log_success(f"Detected embedding dimension: {dim}")
+    return embedder, dim
+
 
-    client = OpenSearch(
+def make_client() -> OpenSearch:
+    return OpenSearch(
         hosts=[OPENSEARCH_URL],
         http_auth=("admin", OPENSEARCH_PASSWORD),   # ALWAYS REQUIRED
         use_ssl=OPENSEARCH_URL.startswith("https"),
@@ -320,49 +1233,124 @@ def main():
         timeout=60,
         max_retries=5,
         retry_on_timeout=True,
+        pool_maxsize=max(10, BULK_THREADS),
     )
 
-    # CREATE INDEX IF NOT EXISTS
-    if not client.indices.exists(OPENSEARCH_INDEX):
-        log_warn("Index does not exist. Creating...")
-        client.indices.create(
-            index=OPENSEARCH_INDEX,
-            body={
-                "settings": {
-                    "index": {
-                        "knn": True,
-                        "knn.algo_param.ef_search": 512
-                    }
-                },
-                "mappings": {
-                    "properties": {
-                        "embedding": {
-                            "type": "knn_vector",
-                            "dimension": EMBED_DIM,
-                            "method": {
-                                "name": "hnsw",
-                                "space_type": "l2",
-                                "engine": "lucene"
-                            }
-                        }
-                    }
-                }
-            }
+
+def main():
+    if INDEX_PER_STORE and not REINDEX_VERSIONED:
+        raise ValueError("INDEX_PER_STORE=1 requires REINDEX_VERSIONED=1")
+
+    embedder, EMBED_DIM = load_embedder()
+    client = make_client()
+
+    checkpoint = open_checkpoint(client)
+    resumed = checkpoint is not None
+    version = None
+
+    stats = StageStats()
+    cache = EmbeddingCache(EMBED_CACHE_DIR, EMBED_MODEL_NAME, EMBED_DIM) if EMBED_CACHE_DIR else None
+    embed = EmbedStage(embedder, EMBED_DIM, stats, cache)
+
+    # a resumed run must keep the vector artifacts it started with;
+    # projection first: the quantizer is calibrated on projected vectors
+    embed.projection = load_projection(embed, refit=not resumed)
+    embed.quantizer = load_quantizer(embed, refit=not resumed)
+    artifacts = {
+        "projection": embed.projection.version if embed.projection else None,
+        "quantizer": embed.quantizer.version if embed.quantizer else None,
+    }
+    if resumed and any(checkpoint.run.get(k) != v for k, v in artifacts.items()):
+        embed.close()
+        raise RuntimeError(
+            "Vector artifacts changed since the interrupted run; rerun with INGEST_RESUME=0"
+        )
+    body = index_body_for(embed)
+
+    if resumed:
+        indices = checkpoint.run["indices"]
+        log_warn(
+            f"Resuming unfinished run into {', '.join(indices.values()) or 'per-store indexes'} "
+            f"({checkpoint.total_acked()} docs acked)"
         )
-        log_success("Index created.")
 
-    docs = list(iter_raw_documents())
-    log_success(f"Loaded raw docs: {len(docs)}")
+    # per-store indexes are created as their stores show up
+    elif INDEX_PER_STORE:
+        version = next_version(client)
+        indices = {}
 
-    docs = dedupe_docs(docs)
+    elif REINDEX_VERSIONED:
+        indices = {"": create_versioned_index(client, body)}
 
+    # CREATE INDEX IF NOT EXISTS
+    else:
+        indices = {"": OPENSEARCH_INDEX}
+        if not client.indices.exists(OPENSEARCH_INDEX):
+            log_warn("Index does not exist. Creating...")
+            client.indices.create(index=OPENSEARCH_INDEX, body=body)
+            log_success("Index created.")
+
+    if not resumed:
+        checkpoint = IngestCheckpoint(CHECKPOINT_PATH, {
+            **checkpoint_run_key(),
+            "version": version,
+            "indices": indices,
+            "load_settings": {},
+            **artifacts,
+        })
+        checkpoint.save()
+
+    # raw JSONL → normalize → dedupe → embed → bulk, one batch at a time
     log_info("Indexing to OpenSearch...")
-    success, errors = helpers.bulk(client, iter_actions(embedder, docs, EMBED_DIM))
+    dedupe = DedupeIndex()
+
+    def on_chunk(chunk, failures):
+        failed_ids = {f["_id"] for f in failures}
+        checkpoint.acked(
+            [a["_ref"] for a in chunk],
+            [a["_ref"] for a in chunk if a["_id"] in failed_ids],
+        )
+        if checkpoint.due(CHECKPOINT_INTERVAL):
+            if cache is not None:
+                cache.flush()
+            checkpoint.save()
+
+    uploader = BulkUploader(client, stats, on_chunk, append_failures=resumed)
+    complete = False
+    start = time.perf_counter()
+    try:
+        # every target index leaves bulk-load mode when the stack unwinds
+        with ExitStack() as stack:
+            targets = IndexTargets(client, body, checkpoint, stack)
+            success, failed = uploader.run(
+                iter_actions(embed, iter_raw_documents(checkpoint), dedupe, targets.route, checkpoint)
+            )
+        complete = True
+    finally:
+        # a resumed run only touched part of the cache → never compact it
+        embed.close(complete and not resumed)
+        dedupe.close()
+        checkpoint.save()
+
+    stats.add("total", success + failed, time.perf_counter() - start)
+    stats.report()
+
     log_success(f"Indexed: {success}")
-    if errors:
-        log_error(errors)
 
-    verify(client)
+    if not targets.names():
+        raise RuntimeError("No documents were indexed")
+    target = ",".join(targets.names())
+
+    verify(client, target)
+
+    if REINDEX_VERSIONED:
+        for index in targets.names():
+            warm_up(client, index)
+        check_doc_count(client, target, success)
+        swap_alias(client, checkpoint.run["indices"])
+        prune_versions(client)
+
+    checkpoint.delete()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+"""
+Linear dimensionality reduction (PCA) of stored embeddings.
+
+    y = (x - mean) @ components.T        (in_dim → out_dim)
+
+Fitted on a sample of catalog embeddings and saved as an .npz artifact
+whose `version` is a hash of its parameters. Indexes built with it record
+that version in their mapping _meta and take their vector dimension from
+it; the backend projects query vectors with the same file. Projection is
+applied before quantization.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class Projection:
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, model: str,
+                 explained: float = 0.0):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.model = model
+        self.explained = float(explained)
+        self.in_dim = self.components.shape[1]
+        self.out_dim = self.components.shape[0]
+
+        h = hashlib.blake2b(digest_size=8)
+        h.update(model.encode("utf-8"))
+        h.update(self.mean.tobytes())
+        h.update(self.components.tobytes())
+        self.version = h.hexdigest()
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, out_dim: int, model: str) -> "Projection":
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if out_dim >= vectors.shape[1]:
+            raise ValueError(f"Projection to {out_dim} dims does not reduce {vectors.shape[1]}")
+
+        mean = vectors.mean(axis=0)
+        _, s, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        variance = s ** 2
+        explained = variance[:out_dim].sum() / variance.sum()
+        return cls(mean, vt[:out_dim], model, explained)
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def matches(self, model: str, in_dim: int, out_dim: int) -> bool:
+        return self.model == model and self.in_dim == in_dim and self.out_dim == out_dim
+
+    # --------------------------------------------------
+    # ARTIFACT
+    # --------------------------------------------------
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            np.savez(
+                f,
+                mean=self.mean,
+                components=self.components,
+                model=np.array(self.model),
+                version=np.array(self.version),
+                explained=np.array(self.explained),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["Projection"]:
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"], str(data["model"]), float(data["explained"]))
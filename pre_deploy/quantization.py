@@ -0,0 +1,83 @@
+"""
+Scalar int8 quantization of stored embeddings.
+
+Each dimension is mapped affinely onto [-128, 127]:
+
+    q = clip(round((x - offset) * scale), -128, 127)
+
+offset / scale are calibrated per dimension from a sample of catalog
+embeddings (clipped at QUANT_CLIP_PERCENTILE so outliers do not waste
+the range). The artifact is a small JSON file whose `version` is a hash
+of its parameters; every index built with it records that version in
+its mapping _meta, and the backend quantizes query vectors with the
+same file.
+
+Per-dimension scaling slightly reweights l2 distances in byte space;
+the backend can rescore candidates with the unquantized vectors
+(embedding_fp32) to restore the exact order.
+"""
+
+import json
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+QMIN, QMAX = -128, 127
+
+
+class Quantizer:
+
+    def __init__(self, offset: np.ndarray, scale: np.ndarray, model: str):
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.model = model
+        self.dim = len(self.offset)
+
+        h = hashlib.blake2b(digest_size=8)
+        h.update(model.encode("utf-8"))
+        h.update(self.offset.tobytes())
+        h.update(self.scale.tobytes())
+        self.version = h.hexdigest()
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, model: str, clip_percentile: float = 99.9) -> "Quantizer":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lo = np.percentile(vectors, 100.0 - clip_percentile, axis=0)
+        hi = np.percentile(vectors, clip_percentile, axis=0)
+
+        span = np.where(hi - lo > 1e-12, hi - lo, 1.0)
+        return cls((lo + hi) / 2.0, (QMAX - QMIN) / span, model)
+
+    def quantize(self, vectors: np.ndarray) -> np.ndarray:
+        q = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) * self.scale)
+        return np.clip(q, QMIN, QMAX).astype(np.int8)
+
+    def matches(self, model: str, dim: int) -> bool:
+        return self.model == model and self.dim == dim
+
+    # --------------------------------------------------
+    # ARTIFACT
+    # --------------------------------------------------
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "version": self.version,
+            "model": self.model,
+            "dim": self.dim,
+            "offset": self.offset.tolist(),
+            "scale": self.scale.tolist(),
+        }))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["Quantizer"]:
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        return cls(data["offset"], data["scale"], data["model"])
@@ -0,0 +1,12 @@
+import os
+import sys
+from pathlib import Path
+
+# opensearch_client reads its config at import time
+os.environ.setdefault("DATA_ROOT", str(Path(__file__).resolve().parent))
+os.environ["OPENSEARCH_INDEX"] = "products"
+os.environ.setdefault("EMBED_MODEL", "intfloat/multilingual-e5-small")
+os.environ.setdefault("OPENSEARCH_PASSWORD", "test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
@@ -0,0 +1,123 @@
+"""
+In-memory stand-in for the parts of the OpenSearch client the versioned
+reindex uses: index create/delete/exists/get, aliases (atomic
+update_aliases including remove_index) and count.
+"""
+
+from fnmatch import fnmatch
+
+
+class FakeIndices:
+
+    def __init__(self, cluster: "FakeOpenSearch"):
+        self.cluster = cluster
+
+    # --------------------------------------------------
+    # INDICES
+    # --------------------------------------------------
+    def exists(self, index):
+        return index in self.cluster.docs or index in self.cluster.aliases()
+
+    def create(self, index, body=None):
+        if self.exists(index):
+            raise ValueError(f"resource_already_exists_exception: {index}")
+        self.cluster.docs[index] = 0
+        self.cluster.alias_map[index] = set()
+
+    def delete(self, index):
+        for name in self.cluster.resolve(index):
+            del self.cluster.docs[name]
+            del self.cluster.alias_map[name]
+
+    def get(self, index, ignore_unavailable=False):
+        return {name: {} for name in self._match(index, ignore_unavailable)}
+
+    # --------------------------------------------------
+    # ALIASES
+    # --------------------------------------------------
+    def exists_alias(self, name):
+        return name in self.cluster.aliases()
+
+    def get_alias(self, name=None, index=None, ignore_unavailable=False):
+        if name is not None:
+            targets = self.cluster.aliases().get(name)
+            if not targets:
+                raise KeyError(f"alias [{name}] missing")
+            return {t: {"aliases": {name: {}}} for t in targets}
+        return {
+            t: {"aliases": {a: {} for a in self.cluster.alias_map[t]}}
+            for t in self._match(index, ignore_unavailable)
+        }
+
+    def update_aliases(self, body):
+        # validate everything first: the real call is all-or-nothing
+        docs = dict(self.cluster.docs)
+        alias_map = {k: set(v) for k, v in self.cluster.alias_map.items()}
+
+        for action in body["actions"]:
+            (op, args), = action.items()
+            index = args["index"]
+            if index not in docs:
+                raise ValueError(f"index_not_found_exception: {index}")
+            if op == "add":
+                alias_map[index].add(args["alias"])
+            elif op == "remove":
+                if args["alias"] not in alias_map[index]:
+                    raise ValueError(f"aliases_not_found_exception: {args['alias']}")
+                alias_map[index].discard(args["alias"])
+            elif op == "remove_index":
+                del docs[index]
+                del alias_map[index]
+            else:
+                raise ValueError(f"unknown alias action {op}")
+
+        names = {a for aliases in alias_map.values() for a in aliases}
+        clash = names & set(docs)
+        if clash:
+            raise ValueError(f"invalid_alias_name_exception: {sorted(clash)} is an index")
+
+        self.cluster.docs, self.cluster.alias_map = docs, alias_map
+        self.cluster.update_calls += 1
+
+    def _match(self, pattern, ignore_unavailable):
+        names = [n for n in self.cluster.docs if fnmatch(n, pattern)]
+        if not names and not ignore_unavailable and "*" not in pattern:
+            raise KeyError(f"no such index [{pattern}]")
+        return sorted(names)
+
+
+class FakeOpenSearch:
+
+    def __init__(self):
+        self.docs = {}              # index → doc count
+        self.alias_map = {}         # index → aliases
+        self.update_calls = 0
+        self.indices = FakeIndices(self)
+
+    def aliases(self):
+        out = {}
+        for index, aliases in self.alias_map.items():
+            for a in aliases:
+                out.setdefault(a, []).append(index)
+        return out
+
+    def resolve(self, name):
+        """Concrete indices behind an index name, alias or comma-separated list."""
+        out = []
+        for part in name.split(","):
+            if part in self.docs:
+                out.append(part)
+            elif part in self.aliases():
+                out.extend(self.aliases()[part])
+            else:
+                raise KeyError(f"no such index [{part}]")
+        return out
+
+    def count(self, index):
+        return {"count": sum(self.docs[n] for n in self.resolve(index))}
+
+    # test helper: an index with `docs` documents
+    def add_index(self, name, docs, aliases=()):
+        self.indices.create(index=name)
+        self.docs[name] = docs
+        self.alias_map[name] = set(aliases)
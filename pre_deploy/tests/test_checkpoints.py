@@ -0,0 +1,38 @@
+from checkpoints import IngestCheckpoint
+
+
+def refs(source, lines):
+    # line n ends at byte 10·n
+    return [(source, n, 10 * n) for n in lines]
+
+
+def dispatch(checkpoint, source, lines):
+    for ref in refs(source, lines):
+        checkpoint.dispatched(ref)
+    checkpoint.file_read(source)
+
+
+def test_offset_follows_acknowledged_prefix(tmp_path):
+    checkpoint = IngestCheckpoint(tmp_path / "ckpt.json", {})
+    dispatch(checkpoint, "a.jsonl", range(1, 6))
+
+    checkpoint.acked(refs("a.jsonl", [1, 2, 4]))
+    assert checkpoint.resume_point("a.jsonl") == (20, 2, False)
+
+    checkpoint.acked(refs("a.jsonl", [3, 5]))
+    assert checkpoint.resume_point("a.jsonl") == (50, 5, True)
+
+
+def test_offset_stops_before_rejected_line(tmp_path):
+    checkpoint = IngestCheckpoint(tmp_path / "ckpt.json", {})
+    dispatch(checkpoint, "a.jsonl", range(1, 6))
+
+    checkpoint.acked(refs("a.jsonl", range(1, 6)), failed=refs("a.jsonl", [3]))
+
+    # resume re-reads line 3 onwards; the file is not finished
+    assert checkpoint.resume_point("a.jsonl") == (20, 2, False)
+    assert checkpoint.files["a.jsonl"]["failed"] == 1
+
+    checkpoint.save()
+    resumed = IngestCheckpoint.load(tmp_path / "ckpt.json")
+    assert resumed.resume_point("a.jsonl") == (20, 2, False)
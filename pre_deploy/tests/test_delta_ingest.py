@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+import delta_ingest as di
+
+
+class FlakyBulk:
+    """Stands in for DeltaIngest._upload: records what was sent, fails `fail` once."""
+
+    def __init__(self):
+        self.fail = set()
+        self.upserted = []
+        self.deleted = []
+
+    def __call__(self, docs, deletes):
+        docs, deletes = [d["id"] for d in docs], set(deletes)
+        self.upserted.extend(docs)
+        self.deleted.extend(deletes)
+        failed, self.fail = self.fail & (set(docs) | deletes), set()
+        return failed
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    root = tmp_path / "data"
+    (root / "phones").mkdir(parents=True)
+    monkeypatch.setattr(di, "DATA_ROOT", root)
+    return root / "phones"
+
+
+@pytest.fixture
+def ingest(tmp_path):
+    delta = di.DeltaIngest(di.DeltaState(tmp_path / "state.sqlite"))
+    delta._upload = FlakyBulk()
+    return delta
+
+
+def write(path, ids, mode="w"):
+    with path.open(mode) as f:
+        for pid in ids:
+            f.write(json.dumps({"id": pid, "title_en": f"product {pid}"}) + "\n")
+
+
+def test_failed_upserts_are_retried(data, ingest):
+    bulk = ingest._upload
+    path = data / "a.jsonl"
+    write(path, ["1", "2", "3"])
+
+    bulk.fail = {"2"}
+    assert ingest.sync() == (2, 0)
+
+    bulk.upserted.clear()
+    assert ingest.sync() == (1, 0)
+    assert bulk.upserted == ["2"]
+
+    # synced: nothing left to push
+    bulk.upserted.clear()
+    assert ingest.sync() == (0, 0)
+    assert bulk.upserted == []
+
+
+def test_failed_appended_upserts_are_retried(data, ingest):
+    bulk = ingest._upload
+    path = data / "a.jsonl"
+    write(path, ["1"])
+    ingest.sync()
+
+    write(path, ["2", "3"], mode="a")
+    bulk.fail = {"3"}
+    bulk.upserted.clear()
+    ingest.sync()
+    assert bulk.upserted == ["2", "3"]
+
+    bulk.upserted.clear()
+    ingest.sync()
+    assert bulk.upserted == ["3"]
+
+
+def test_failed_deletes_are_retried(data, ingest):
+    bulk = ingest._upload
+    path = data / "a.jsonl"
+    write(path, ["1", "2", "3"])
+    ingest.sync()
+
+    write(path, ["1"])                              # rewrite drops 2 and 3
+    bulk.fail = {"3"}
+    assert ingest.sync() == (0, 1)
+
+    bulk.deleted.clear()
+    assert ingest.sync() == (0, 1)
+    assert bulk.deleted == ["3"]
+    assert ingest.state.product_ids(str(path)) == {"1"}
+
+
+def test_failed_deletes_of_removed_file_are_retried(data, ingest):
+    bulk = ingest._upload
+    path = data / "a.jsonl"
+    write(path, ["1", "2"])
+    ingest.sync()
+
+    path.unlink()
+    bulk.fail = {"2"}
+    assert ingest.sync() == (0, 1)
+    assert ingest.state.paths() == [str(path)]
+
+    bulk.deleted.clear()
+    assert ingest.sync() == (0, 1)
+    assert bulk.deleted == ["2"]
+    assert ingest.state.paths() == []
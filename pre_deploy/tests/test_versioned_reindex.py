@@ -0,0 +1,126 @@
+import pytest
+
+import opensearch_client as oc
+from fake_opensearch import FakeOpenSearch
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(oc, "REINDEX_KEEP_VERSIONS", 2)
+    monkeypatch.setattr(oc, "REINDEX_MIN_DOC_RATIO", 0.9)
+    return FakeOpenSearch()
+
+
+def build(client, docs):
+    """One loader run up to the swap: new version, loaded, checked."""
+    index = oc.create_versioned_index(client, {})
+    client.docs[index] = docs
+    oc.check_doc_count(client, index, docs)
+    return index
+
+
+def release(client, docs):
+    index = build(client, docs)
+    oc.swap_alias(client, {"": index})
+    oc.prune_versions(client)
+    return index
+
+
+def test_first_run_replaces_concrete_index(client):
+    client.add_index("products", 100)
+
+    index = build(client, 100)
+    assert index == "products_v1"
+    # the live concrete index keeps serving until the swap
+    assert client.count(index="products")["count"] == 100
+
+    oc.swap_alias(client, {"": index})
+
+    assert oc.alias_targets(client, "products") == ["products_v1"]
+    assert "products" not in client.docs
+    assert client.update_calls == 1
+
+
+def test_short_first_build_keeps_concrete_index(client):
+    client.add_index("products", 100)
+
+    with pytest.raises(RuntimeError):
+        build(client, 50)                  # e.g. wrong DATA_ROOT or a partial load
+
+    # the concrete index was never replaced
+    assert client.count(index="products")["count"] == 100
+    assert client.update_calls == 0
+
+
+def test_first_run_on_empty_cluster(client):
+    release(client, 50)
+    assert oc.alias_targets(client, "products") == ["products_v1"]
+
+
+def test_rerun_swaps_and_prunes(client):
+    release(client, 100)
+    release(client, 100)
+    assert oc.alias_targets(client, "products") == ["products_v2"]
+    assert sorted(client.docs) == ["products_v1", "products_v2"]
+
+    release(client, 105)
+    assert oc.alias_targets(client, "products") == ["products_v3"]
+    # v1 pruned, previous version kept for rollback
+    assert sorted(client.docs) == ["products_v2", "products_v3"]
+
+
+def test_short_build_never_goes_live(client):
+    release(client, 100)
+
+    with pytest.raises(RuntimeError):
+        build(client, 50)                  # below REINDEX_MIN_DOC_RATIO of live
+
+    assert oc.alias_targets(client, "products") == ["products_v1"]
+    assert client.count(index="products")["count"] == 100
+
+
+def test_rollback_to_previous_version(client):
+    release(client, 100)
+    release(client, 120)
+
+    assert oc.rollback_alias(client) == {"": "products_v1"}
+    assert oc.alias_targets(client, "products") == ["products_v1"]
+    assert client.count(index="products")["count"] == 100
+
+    # nothing older left
+    with pytest.raises(RuntimeError):
+        oc.rollback_alias(client)
+
+
+def test_prune_keeps_live_version_after_rollback(client):
+    release(client, 100)
+    release(client, 100)
+    oc.rollback_alias(client)                       # live: v1
+
+    release(client, 100)                            # v3 goes live, v1 is oldest
+    assert oc.alias_targets(client, "products") == ["products_v3"]
+    assert sorted(client.docs) == ["products_v2", "products_v3"]
+
+    oc.rollback_alias(client)                       # live: v2
+    oc.prune_versions(client)
+    assert sorted(client.docs) == ["products_v2", "products_v3"]
+
+
+def test_per_store_swap(client):
+    release(client, 100)
+
+    indices = {"jarir": "products_jarir_v2", "noon": "products_noon_v2"}
+    client.add_index("products_jarir_v2", 50)
+    client.add_index("products_noon_v2", 60)
+
+    oc.check_doc_count(client, ",".join(indices.values()), 110)
+    oc.swap_alias(client, indices)
+
+    assert oc.alias_targets(client, "products") == ["products_jarir_v2", "products_noon_v2"]
+    assert oc.alias_targets(client, "products_noon") == ["products_noon_v2"]
+    assert client.count(index="products")["count"] == 110
+
+    # rolling back from per-store v2 to the shared v1 drops the store aliases
+    assert oc.rollback_alias(client) == {"": "products_v1"}
+    assert oc.alias_targets(client, "products") == ["products_v1"]
+    assert not client.indices.exists_alias(name="products_noon")
@@ -0,0 +1,262 @@
+"""
+VECTOR SNAPSHOT
+Exports the live index's vectors as a memory-mapped IVF snapshot the
+backend can search in-process (VECTOR_BACKEND=local) instead of sending
+every kNN query to OpenSearch:
+
+    vectors.f32        float32 rows, grouped by IVF list
+    norms.npy          ||x||² per row
+    centroids.npy      IVF list centroids (k-means on a sample)
+    offsets.npy        rows of list i are offsets[i]:offsets[i+1]
+    ids.json           document _id per row
+    index.npy          concrete index per row (code into meta["indices"])
+    store.npy / brand.npy / product_group.npy   filter codes (-1 = none) into
+                       meta["vocab"], the raw values; the backend folds them
+                       like the index's lowercase_normalizer when it loads
+    price.npy          price_final (NaN = none)
+    sources.jsonl      SNAPSHOT_SOURCE_FIELDS per row (rerank + response fields),
+                       row i is bytes source_offsets[i]:source_offsets[i+1]
+    meta.json          shape, vocabularies, indices, vector artifact versions
+
+Usage:
+    python -m vector_snapshot            after `make seed` (no-op unless VECTOR_SNAPSHOT=1)
+    python -m vector_snapshot --force    refresh now, e.g. after delta ingest
+
+The snapshot is written next to the old one and swapped in with a rename.
+Delta ingest does not update it; changes since the last export are served
+from OpenSearch only after the next export.
+"""
+
+import os
+import json
+import math
+import time
+import shutil
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from opensearchpy import helpers
+
+from exact_knn import exact_topk
+from opensearch_client import (
+    BASE_DIR,
+    OPENSEARCH_INDEX,
+    alias_targets,
+    log_info,
+    log_success,
+    log_warn,
+    make_client,
+)
+
+# ---------------------------------------------------
+# CONFIG
+# ---------------------------------------------------
+# VECTOR_SNAPSHOT:     export after every full `make seed`
+# VECTOR_SNAPSHOT_DIR: shared with the backend (VECTOR_SNAPSHOT_DIR there)
+# SNAPSHOT_IVF_LISTS:  IVF lists (0 → 4·√rows)
+# SNAPSHOT_IVF_SAMPLE: vectors k-means is trained on
+# SNAPSHOT_IVF_ITERS:  k-means iterations
+# SNAPSHOT_SOURCE_FIELDS: _source fields stored per row, so the backend can
+#                      rerank and answer local kNN hits without an mget
+#                      (rerank text + the response DTO fields)
+VECTOR_SNAPSHOT = os.getenv("VECTOR_SNAPSHOT", "0") == "1"
+VECTOR_SNAPSHOT_DIR = Path(os.getenv("VECTOR_SNAPSHOT_DIR", BASE_DIR / "artifacts" / "vector_snapshot"))
+SNAPSHOT_IVF_LISTS = int(os.getenv("SNAPSHOT_IVF_LISTS", 0))
+SNAPSHOT_IVF_SAMPLE = int(os.getenv("SNAPSHOT_IVF_SAMPLE", 100000))
+SNAPSHOT_IVF_ITERS = int(os.getenv("SNAPSHOT_IVF_ITERS", 10))
+SNAPSHOT_SOURCE_FIELDS = [
+    f for f in os.getenv(
+        "SNAPSHOT_SOURCE_FIELDS",
+        "id,rerank_text,title_en,title_ar,brand,url,price_final,currency,product_group,image_paths,store",
+    ).split(",") if f
+]
+
+FILTER_FIELDS = ("store", "brand", "product_group")
+CHUNK_ROWS = 65536
+SEED = 13
+
+
+# ---------------------------------------------------
+# HELPERS
+# ---------------------------------------------------
+def train_ivf(vectors: np.ndarray, nlist: int, sample: int, iters: int) -> np.ndarray:
+    """k-means centroids (l2) on a random sample of `vectors`."""
+    rng = np.random.default_rng(SEED)
+    rows = np.sort(rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False))
+    train = np.asarray(vectors[rows], dtype=np.float32)
+    centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+
+    for i in range(iters):
+        assign = exact_topk(centroids, train, 1)[:, 0]
+        counts = np.bincount(assign, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, train)
+
+        # an empty list restarts at a random training vector
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = train[rng.choice(len(train), size=int(empty.sum()))]
+        log_info(f"IVF k-means {i + 1}/{iters}: {int(empty.sum())} empty lists")
+
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        block = np.asarray(vectors[start:start + CHUNK_ROWS])
+        out[start:start + len(block)] = exact_topk(centroids, block, 1)[:, 0]
+    return out
+
+
+def index_meta(client, indices: List[str]) -> Dict[str, Any]:
+    """Vector artifact versions the indices were built with (mapping _meta)."""
+    metas = {
+        json.dumps(m["mappings"].get("_meta", {}), sort_keys=True)
+        for m in client.indices.get_mapping(index=",".join(indices)).values()
+    }
+    if len(metas) > 1:
+        raise RuntimeError(f"Indices were built with different vector artifacts: {metas}")
+    return json.loads(metas.pop()) if metas else {}
+
+
+# ---------------------------------------------------
+# EXPORT
+# ---------------------------------------------------
+def export(client, path: Path = VECTOR_SNAPSHOT_DIR):
+    indices = alias_targets(client, OPENSEARCH_INDEX) or [OPENSEARCH_INDEX]
+    artifacts = index_meta(client, indices)
+
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    # 1) stream vectors, filter columns and stored fields in scan order
+    ids, index_codes, prices, source_offsets = [], [], [], [0]
+    columns = {f: [] for f in FILTER_FIELDS}
+    vocab = {f: {} for f in FILTER_FIELDS}
+    dim = None
+    start = time.perf_counter()
+
+    raw_path = tmp / "raw.f32"
+    raw_sources_path = tmp / "raw_sources.jsonl"
+    fetch = sorted({"embedding", "embedding_fp32", "price_final", *FILTER_FIELDS, *SNAPSHOT_SOURCE_FIELDS})
+    with raw_path.open("wb") as f, raw_sources_path.open("wb") as sf:
+        for hit in helpers.scan(
+            client, index=",".join(indices), size=1000, query={"_source": fetch},
+        ):
+            src = hit["_source"]
+            vec = src.get("embedding_fp32") or src.get("embedding")
+            if not vec:
+                continue
+            dim = dim or len(vec)
+            f.write(np.asarray(vec, dtype=np.float32).tobytes())
+
+            # every field present (None when absent) so the backend knows it is complete
+            line = json.dumps(
+                {field: src.get(field) for field in SNAPSHOT_SOURCE_FIELDS}, ensure_ascii=False
+            ).encode("utf-8")
+            sf.write(line)
+            source_offsets.append(source_offsets[-1] + len(line))
+
+            ids.append(hit["_id"])
+            index_codes.append(indices.index(hit["_index"]))
+            price = src.get("price_final")
+            prices.append(np.nan if price is None else float(price))
+            for field in FILTER_FIELDS:
+                value = src.get(field)
+                columns[field].append(
+                    -1 if not value else vocab[field].setdefault(value, len(vocab[field]))
+                )
+
+    rows = len(ids)
+    if not rows:
+        shutil.rmtree(tmp)
+        raise RuntimeError(f"{OPENSEARCH_INDEX} has no vectors to export")
+    log_info(f"Scanned {rows} × {dim} vectors from {', '.join(indices)} in {time.perf_counter() - start:.1f}s")
+
+    # 2) IVF: train, assign, group rows by list
+    raw = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(rows, dim))
+    nlist = min(rows, SNAPSHOT_IVF_LISTS or max(1, int(4 * math.sqrt(rows))))
+    start = time.perf_counter()
+    centroids = train_ivf(raw, nlist, max(SNAPSHOT_IVF_SAMPLE, nlist), SNAPSHOT_IVF_ITERS)
+    lists = assign_lists(raw, centroids)
+    order = np.argsort(lists, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=nlist))])
+    log_info(f"IVF: {nlist} lists trained and assigned in {time.perf_counter() - start:.1f}s")
+
+    norms = np.empty(rows, dtype=np.float32)
+    with (tmp / "vectors.f32").open("wb") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            block = np.asarray(raw[order[start:start + CHUNK_ROWS]])
+            norms[start:start + len(block)] = (block * block).sum(axis=1)
+            f.write(block.tobytes())
+    del raw
+    raw_path.unlink()
+
+    # stored fields, reordered like the vectors
+    raw_offsets = np.asarray(source_offsets, dtype=np.int64)
+    raw_sources = np.memmap(raw_sources_path, dtype=np.uint8, mode="r")
+    new_offsets = np.zeros(rows + 1, dtype=np.int64)
+    with (tmp / "sources.jsonl").open("wb") as f:
+        for i, r in enumerate(order.tolist()):
+            line = raw_sources[raw_offsets[r]:raw_offsets[r + 1]].tobytes()
+            f.write(line)
+            new_offsets[i + 1] = new_offsets[i] + len(line)
+    del raw_sources
+    raw_sources_path.unlink()
+    np.save(tmp / "source_offsets.npy", new_offsets)
+
+    np.save(tmp / "norms.npy", norms)
+    np.save(tmp / "centroids.npy", centroids)
+    np.save(tmp / "offsets.npy", offsets.astype(np.int64))
+    np.save(tmp / "index.npy", np.asarray(index_codes, dtype=np.int16)[order])
+    np.save(tmp / "price.npy", np.asarray(prices, dtype=np.float32)[order])
+    for field in FILTER_FIELDS:
+        np.save(tmp / f"{field}.npy", np.asarray(columns[field], dtype=np.int32)[order])
+    (tmp / "ids.json").write_text(json.dumps([ids[i] for i in order]))
+    (tmp / "meta.json").write_text(json.dumps({
+        "rows": rows,
+        "dim": dim,
+        "nlist": nlist,
+        "space_type": "l2",
+        "indices": indices,
+        "projection": artifacts.get("projection"),
+        "source_fields": SNAPSHOT_SOURCE_FIELDS,
+        "vocab": {f: list(v) for f, v in vocab.items()},
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }, ensure_ascii=False))
+
+    # 3) swap in: the backend reads the snapshot only at startup
+    old = path.with_name(path.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if path.exists():
+        path.rename(old)
+    tmp.rename(path)
+    shutil.rmtree(old, ignore_errors=True)
+    log_success(f"Vector snapshot written to {path} ({rows} vectors, {nlist} IVF lists)")
+
+
+# ---------------------------------------------------
+# MAIN
+# ---------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Export an in-process IVF vector snapshot")
+    parser.add_argument("--force", action="store_true", help="export even if VECTOR_SNAPSHOT=0")
+    args = parser.parse_args()
+
+    if not (VECTOR_SNAPSHOT or args.force):
+        log_info("VECTOR_SNAPSHOT=0 → no vector snapshot exported")
+        return
+
+    client = make_client()
+    if not client.indices.exists(OPENSEARCH_INDEX):
+        log_warn(f"{OPENSEARCH_INDEX} does not exist. Run a full `make seed` first.")
+        return
+    export(client)
+
+
+if __name__ == "__main__":
+    main()